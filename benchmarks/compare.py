@@ -0,0 +1,44 @@
+"""Compare two benchmarks.load reports, e.g. of two commits.
+
+Run from the project root:
+
+    python -m benchmarks.compare benchmarks/results/abc1234.json benchmarks/results/def5678.json
+
+Prints, for every scenario in both reports, the throughput, p50 and p99 latency and peak RSS
+of each report and the relative change from the first to the second.
+"""
+import argparse
+import json
+from typing import Optional
+
+METRICS = (("throughput", "req/s"), ("p50_ms", "p50 ms"), ("p99_ms", "p99 ms"), ("peak_rss_mb", "RSS MB"))
+
+
+def change(before: Optional[float], after: Optional[float]) -> str:
+    if not before or after is None:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+    with open(args.before) as before_file, open(args.after) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+
+    print(f"before: {before.get('commit')} ({before.get('created_at')})")
+    print(f"after:  {after.get('commit')} ({after.get('created_at')})")
+    for name, result in before["scenarios"].items():
+        other = after["scenarios"].get(name)
+        if other is None:
+            continue
+        print(name)
+        for key, label in METRICS:
+            print(f"  {label:<8}{result.get(key) or 0:>12.2f}{other.get(key) or 0:>12.2f}"
+                  f"{change(result.get(key), other.get(key)):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Fill a MongoDB database with synthetic Instacart-shaped data.
+
+Run from the project root against the database in DB_CONN:
+
+    python -m benchmarks.generate --orders 100000
+
+The collections get the same names and fields as the Instacart import (orders, orders_train,
+products, aisles, departments), about ten order lines per order and 50000 products. The same
+--orders and --seed always give the same data. Existing collections are dropped first, together
+with the version stamps and stored analysis jobs that described them.
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+from dotenv import find_dotenv, load_dotenv
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from benchmarks.hypotheses import synthetic_frames
+from src.main.db.connector import JOBS_COLLECTION, VERSIONS_COLLECTION, DBConnector
+
+# DataFrame of synthetic_frames -> collection
+FRAME_COLLECTIONS = {
+    "departments_df": "departments",
+    "aisles_df": "aisles",
+    "products_df": "products",
+    "orders_df": "orders",
+    "order_products_df": "orders_train",
+}
+INSERT_BATCH_SIZE = 10000
+
+
+def synthetic_collections(n_orders: int, n_products: int = 50000, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    frames = synthetic_frames(n_orders, n_products, seed)
+    orders = frames["orders_df"]
+    # As in the real data, a user's first order has no previous order
+    orders["days_since_prior_order"] = orders["days_since_prior_order"].where(orders["order_number"] > 1, np.nan)
+    return {FRAME_COLLECTIONS[name]: frame for name, frame in frames.items()}
+
+
+def iter_documents(frame: pd.DataFrame, batch_size: int = INSERT_BATCH_SIZE) -> Iterator[List[dict]]:
+    for start in range(0, len(frame), batch_size):
+        # to_dict gives native Python values, which BSON can encode
+        yield frame.iloc[start:start + batch_size].astype(object).to_dict("records")
+
+
+async def seed_database(database: AsyncIOMotorDatabase, n_orders: int, n_products: int = 50000,
+                        seed: int = 0) -> Dict[str, int]:
+    """Replace the Instacart collections of `database` with synthetic data and return their sizes."""
+    sizes = {}
+    for collection_name in (*FRAME_COLLECTIONS.values(), VERSIONS_COLLECTION, JOBS_COLLECTION):
+        await database.drop_collection(collection_name)
+    for collection_name, frame in synthetic_collections(n_orders, n_products, seed).items():
+        collection = database.get_collection(collection_name)
+        for documents in iter_documents(frame):
+            await collection.insert_many(documents, ordered=False)
+        sizes[collection_name] = len(frame)
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100000, help="number of orders, e.g. 10000 to 3000000")
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    load_dotenv(find_dotenv())
+
+    async def run():
+        db = DBConnector(conn_id=os.getenv("DB_CONN"))
+        started = time.perf_counter()
+        sizes = await seed_database(db.database, args.orders, args.products, args.seed)
+        for collection_name, size in sizes.items():
+            print(f"{collection_name:<14}{size:>12}")
+        print(f"generated in {time.perf_counter() - started:.1f} s")
+        db.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
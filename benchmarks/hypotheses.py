@@ -0,0 +1,181 @@
+"""Compare the DataAnalysis hypotheses with the original row-wise implementations.
+
+Run from the project root:
+
+    python -m benchmarks.hypotheses --orders 200000
+
+Both versions run on the same synthetic Instacart-shaped frames; the script fails if any
+result differs and prints the time of each version.
+"""
+import argparse
+import asyncio
+import math
+import time
+from typing import Any, Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+from src.main.eda.utils import FRAME_DTYPES, DataAnalysis, coerce_dtypes
+
+
+def synthetic_frames(n_orders: int, n_products: int = 50000, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    aisles = pd.DataFrame({"aisle_id": np.arange(1, 135), "aisle": [f"aisle {i}" for i in range(1, 135)]})
+    departments = pd.DataFrame({"department_id": np.arange(1, 22),
+                                "department": [f"department {i}" for i in range(1, 22)]})
+    products = pd.DataFrame({
+        "product_id": np.arange(1, n_products + 1),
+        "product_name": [f"product {i}" for i in range(1, n_products + 1)],
+        "aisle_id": rng.integers(1, 135, n_products),
+        "department_id": rng.integers(1, 22, n_products),
+    })
+    orders = pd.DataFrame({
+        "order_id": np.arange(1, n_orders + 1),
+        "user_id": rng.integers(1, max(n_orders // 15, 2), n_orders),
+        "eval_set": rng.choice(["prior", "train", "test"], n_orders),
+        "order_number": rng.integers(1, 100, n_orders),
+        "order_dow": rng.integers(0, 7, n_orders),
+        "order_hour_of_day": rng.integers(0, 24, n_orders),
+        "days_since_prior_order": rng.integers(0, 31, n_orders).astype("float64"),
+    })
+    lines_per_order = rng.integers(1, 20, n_orders)
+    order_ids = np.repeat(orders["order_id"].to_numpy(), lines_per_order)
+    order_products = pd.DataFrame({
+        "order_id": order_ids,
+        "product_id": rng.integers(1, n_products + 1, len(order_ids)),
+        "add_to_cart_order": np.concatenate([np.arange(1, n + 1) for n in lines_per_order]),
+        "reordered": rng.integers(0, 2, len(order_ids)),
+    })
+    frames = {"orders_df": orders, "order_products_df": order_products, "products_df": products,
+              "aisles_df": aisles, "departments_df": departments}
+    return {name: coerce_dtypes(frame, FRAME_DTYPES[name]) for name, frame in frames.items()}
+
+
+# The implementations before vectorization, kept verbatim as the reference
+def legacy_hypothesis1(f: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    merged_df = f["order_products_df"].merge(f["products_df"], on="product_id")
+    merged_df = merged_df.merge(f["aisles_df"], on="aisle_id")
+    merged_df = merged_df.merge(f["departments_df"], on="department_id")
+    order_aisles = merged_df.groupby('order_id')['aisle'].apply(set).reset_index()
+    total_orders = order_aisles.shape[0]
+    same_aisle_orders = order_aisles[order_aisles['aisle'].apply(lambda x: len(x) == 1)].shape[0]
+    return {
+        "total_orders": total_orders,
+        "same_aisle_orders": same_aisle_orders,
+        "percentage_same_aisle": (same_aisle_orders / total_orders) * 100,
+    }
+
+
+def legacy_hypothesis2(f: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    total_products = f["order_products_df"].shape[0]
+    reordered_products = f["order_products_df"][f["order_products_df"]['reordered'] == 1].shape[0]
+    return {
+        "total_products": total_products,
+        "reordered_products": reordered_products,
+        "percentage_reordered": (reordered_products / total_products) * 100,
+    }
+
+
+def legacy_hypothesis3(f: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    products_df = f["products_df"]
+    basic_products = products_df[products_df['aisle_id'].isin([24, 36, 94])]['aisle_id'].tolist()
+    merged_df = f["order_products_df"].merge(f["orders_df"], on="order_id")
+    basic_orders = merged_df[merged_df['product_id'].isin(basic_products)].copy()
+    basic_orders['time_of_day'] = basic_orders['order_hour_of_day'].apply(
+        lambda x: 'Morning' if 5 <= x < 12 else 'Evening' if 17 <= x <= 23 else 'Other'
+    )
+    return {
+        "morning_count": basic_orders[basic_orders['time_of_day'] == 'Morning'].shape[0],
+        "evening_count": basic_orders[basic_orders['time_of_day'] == 'Evening'].shape[0],
+    }
+
+
+def legacy_hypothesis4(f: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    merged_df = f["order_products_df"].merge(f["products_df"], on="product_id")
+    merged_df = merged_df.merge(f["departments_df"], on="department_id")
+    order_stats = merged_df.groupby('order_id').agg(
+        total_products=('product_id', 'count'),
+        unique_departments=('department_id', 'nunique')
+    ).reset_index()
+    return {
+        "average_departments": order_stats['unique_departments'].mean(),
+        "correlation": order_stats['total_products'].corr(order_stats['unique_departments']),
+    }
+
+
+def legacy_hypothesis5(f: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    merged_df = f["order_products_df"].merge(f["orders_df"], on="order_id")
+    merged_df['is_weekend'] = merged_df['order_dow'].apply(lambda x: x in [0, 1])
+    order_counts = merged_df.groupby(['order_id', 'is_weekend']).size().reset_index(name='product_count')
+    return {
+        "avg_weekend": order_counts[order_counts['is_weekend'] == True]['product_count'].mean(),
+        "avg_weekday": order_counts[order_counts['is_weekend'] == False]['product_count'].mean(),
+    }
+
+
+LEGACY: Dict[int, Callable[[Dict[str, pd.DataFrame]], Dict[str, Any]]] = {
+    1: legacy_hypothesis1,
+    2: legacy_hypothesis2,
+    3: legacy_hypothesis3,
+    4: legacy_hypothesis4,
+    5: legacy_hypothesis5,
+}
+
+
+def same_result(expected: Dict[str, Any], actual: Dict[str, Any]) -> bool:
+    if expected.keys() != actual.keys():
+        return False
+    for key, value in expected.items():
+        value, other = float(value), float(actual[key])
+        if not (math.isclose(value, other, rel_tol=1e-9, abs_tol=1e-12) or (math.isnan(value) and math.isnan(other))):
+            return False
+    return True
+
+
+def analysis_with_frames(frames: Dict[str, pd.DataFrame]) -> DataAnalysis:
+    # The Motor client connects lazily, so no MongoDB is needed while every frame is already set
+    analysis = DataAnalysis(conn_id="mongodb://localhost:27017")
+    for name, frame in frames.items():
+        analysis._set_frame(name, frame)
+    return analysis
+
+
+def timed(function: Callable[[], Any], repeat: int) -> tuple:
+    best, result = math.inf, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    frames = synthetic_frames(args.orders)
+    analysis = analysis_with_frames(frames)
+    print(f"{args.orders} orders, {len(frames['order_products_df'])} order lines")
+    # Built once per data version and shared by hypotheses 1, 3, 4 and 5, so timed on its own
+    fact_seconds, _ = timed(lambda: asyncio.run(analysis.fact_table()), 1)
+    print(f"fact table built in {fact_seconds:.4f} s")
+    print(f"{'hypothesis':<12}{'legacy s':>12}{'current s':>12}{'speedup':>10}  equal")
+    failed = False
+    for number, legacy in LEGACY.items():
+        # __wrapped__ skips the result cache so every repeat really computes
+        method = getattr(DataAnalysis, f"analyze_hypothesis{number}").__wrapped__
+        legacy_seconds, expected = timed(lambda: legacy(frames), args.repeat)
+        current_seconds, actual = timed(lambda: asyncio.run(method(analysis)), args.repeat)
+        equal = same_result(expected, actual)
+        failed = failed or not equal
+        print(f"{number:<12}{legacy_seconds:>12.4f}{current_seconds:>12.4f}"
+              f"{legacy_seconds / current_seconds:>9.1f}x  {equal}")
+    if failed:
+        raise SystemExit("Results differ from the legacy implementation")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""Run load scenarios against every /api/v1 and /analysis/hypothesisN route and write a report.
+
+Run from the project root, with the app in this process and an in-process fake MongoDB
+(needs `pip install -r benchmarks/requirements.txt`):
+
+    python -m benchmarks.load --fake --orders 10000
+
+With the app in this process and the MongoDB in DB_CONN, filled by benchmarks.generate first:
+
+    python -m benchmarks.load --generate --orders 100000
+
+Or against a running server whose database already holds data:
+
+    python -m benchmarks.load --url http://localhost:8000
+
+Each scenario sends --requests requests from --concurrency concurrent clients and reports the
+throughput, p50/p99 latency and the server's peak RSS (from GET /startup). Analysis routes also
+report the first, cold request separately. The report is written as JSON, by default to
+benchmarks/results/<commit>.json; compare two of them with benchmarks.compare.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from dotenv import find_dotenv, load_dotenv
+
+from benchmarks.generate import seed_database
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+Step = Callable[[httpx.AsyncClient, int], Awaitable[int]]
+
+
+def use_fake_mongo():
+    """Make every DBConnector share one in-process mongomock client."""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit("--fake needs mongomock-motor: pip install -r benchmarks/requirements.txt")
+    from src.main.db import connector
+
+    client = AsyncMongoMockClient()
+    connector.AsyncIOMotorClient = lambda *args, **kwargs: client
+    os.environ["DB_CONN"] = "mongodb://fake"
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, round(q * (len(sorted_values) - 1)))]
+
+
+def get(path: str, params: Optional[Callable[[int], Dict[str, Any]]] = None) -> Step:
+    async def step(client: httpx.AsyncClient, i: int) -> int:
+        response = await client.get(path.format(i=i), params=params(i) if params else None)
+        return response.status_code
+
+    return step
+
+
+def get_one(path: str, ids: List[str]) -> Step:
+    async def step(client: httpx.AsyncClient, i: int) -> int:
+        return (await client.get(f"{path}/{ids[i % len(ids)]}")).status_code
+
+    return step
+
+
+def walk_cursor(collection: str) -> Step:
+    # The clients share one position, so the scenario keeps walking the collection page after page
+    position = {"cursor": None}
+
+    async def step(client: httpx.AsyncClient, i: int) -> int:
+        params = {"limit": 100, "include_total": False}
+        if position["cursor"]:
+            params["cursor"] = position["cursor"]
+        response = await client.get(f"/api/v1/{collection}", params=params)
+        if response.status_code < 400:
+            position["cursor"] = response.json()["next_cursor"]
+        return response.status_code
+
+    return step
+
+
+# Document of each collection with a unique id built from a number
+NEW_DOCUMENTS: Dict[str, Callable[[int], Dict[str, Any]]] = {
+    "orders": lambda n: {"order_id": n, "user_id": 1, "eval_set": "prior", "order_number": 1,
+                         "order_dow": 0, "order_hour_of_day": 8, "days_since_prior_order": None},
+    "aisles": lambda n: {"aisle_id": n, "aisle": "benchmark"},
+    "departments": lambda n: {"department_id": n, "department": "benchmark"},
+    "products": lambda n: {"product_id": n, "product_name": "benchmark", "aisle_id": 1, "department_id": 1},
+}
+# Fields the PUT routes take, all of which must be sent
+UPDATE_FIELDS = {
+    "orders": ["eval_set", "order_number", "order_dow", "order_hour_of_day", "days_since_prior_order"],
+    "aisles": ["aisle"],
+    "departments": ["department"],
+    "products": ["product_name", "aisle_id", "department_id"],
+}
+BULK_SIZE = 100
+
+
+def create_and_delete(collection: str, first_id: int) -> Step:
+    async def step(client: httpx.AsyncClient, i: int) -> int:
+        created = await client.post(f"/api/v1/{collection}", json=NEW_DOCUMENTS[collection](first_id + i))
+        if created.status_code >= 400:
+            return created.status_code
+        return (await client.delete(f"/api/v1/{collection}", params={"id": created.json()["id"]})).status_code
+
+    return step
+
+
+def update(collection: str, rows: List[dict]) -> Step:
+    # Writes the sampled rows back unchanged, so the data stays the same across runs
+    async def step(client: httpx.AsyncClient, i: int) -> int:
+        row = rows[i % len(rows)]
+        body = {field: row[field] for field in UPDATE_FIELDS[collection]}
+        return (await client.put(f"/api/v1/{collection}", params={"id": row["id"]}, json=body)).status_code
+
+    return step
+
+
+def bulk_insert_and_delete(collection: str, first_id: int) -> Step:
+    async def step(client: httpx.AsyncClient, i: int) -> int:
+        documents = [NEW_DOCUMENTS[collection](first_id + i * BULK_SIZE + j) for j in range(BULK_SIZE)]
+        inserted = await client.post(f"/api/v1/{collection}/bulk", json=documents)
+        if inserted.status_code >= 400:
+            return inserted.status_code
+        deletes = [{"op": "delete", "id": result["id"]} for result in inserted.json()["results"] if result["ok"]]
+        deleted = await client.post(f"/api/v1/{collection}/bulk", json=deletes)
+        failed = inserted.json()["errors"] or deleted.json()["errors"]
+        return 500 if failed else deleted.status_code
+
+    return step
+
+
+def submit_job() -> Step:
+    async def step(client: httpx.AsyncClient, i: int) -> int:
+        return (await client.post("/api/v1/analysis/jobs", json={"hypothesis": i % 5 + 1})).status_code
+
+    return step
+
+
+def read_job(suffix: str = "") -> Step:
+    # Job ids per hypothesis, submitted by the first request that needs one
+    ids: Dict[int, str] = {}
+
+    async def step(client: httpx.AsyncClient, i: int) -> int:
+        hypothesis = i % 5 + 1
+        if hypothesis not in ids:
+            submitted = await client.post("/api/v1/analysis/jobs", json={"hypothesis": hypothesis})
+            if submitted.status_code >= 400:
+                return submitted.status_code
+            ids[hypothesis] = submitted.json()["id"]
+        return (await client.get(f"/api/v1/analysis/jobs/{ids[hypothesis]}{suffix}")).status_code
+
+    return step
+
+
+async def sample(client: httpx.AsyncClient, collection: str, size: int = 100) -> List[dict]:
+    response = await client.get(f"/api/v1/{collection}", params={"limit": size, "include_total": False})
+    response.raise_for_status()
+    return response.json()[collection]
+
+
+async def build_scenarios(client: httpx.AsyncClient, writes: bool) -> Dict[str, Step]:
+    rows = {collection: await sample(client, collection) for collection in NEW_DOCUMENTS}
+    user_ids = [order["user_id"] for order in rows["orders"]]
+    scenarios: Dict[str, Step] = {
+        "GET /api/v1/orders": get("/api/v1/orders", lambda i: {"skip": i * 10 % 1000, "limit": 100}),
+        "GET /api/v1/orders?cursor": walk_cursor("orders"),
+        "GET /api/v1/orders?user_id": get("/api/v1/orders", lambda i: {"user_id": user_ids[i % len(user_ids)]}),
+        "GET /api/v1/orders/{id}": get_one("/api/v1/orders", [order["id"] for order in rows["orders"]]),
+        "GET /api/v1/products": get("/api/v1/products", lambda i: {"skip": i * 10 % 1000, "limit": 100}),
+        "GET /api/v1/products?cursor": walk_cursor("products"),
+        "GET /api/v1/products?aisle_id": get("/api/v1/products", lambda i: {"aisle_id": i % 134 + 1}),
+        "GET /api/v1/products/{id}": get_one("/api/v1/products", [product["id"] for product in rows["products"]]),
+        "GET /api/v1/aisles": get("/api/v1/aisles", lambda i: {"limit": 100}),
+        "GET /api/v1/aisles/{id}": get_one("/api/v1/aisles", [aisle["id"] for aisle in rows["aisles"]]),
+        "GET /api/v1/departments": get("/api/v1/departments", lambda i: {"limit": 100}),
+        "GET /api/v1/departments/{id}": get_one("/api/v1/departments",
+                                                [department["id"] for department in rows["departments"]]),
+        "GET /api/v1/orders/export": get("/api/v1/orders/export", lambda i: {"format": "ndjson"}),
+        "GET /api/v1/orders_train/export": get("/api/v1/orders_train/export", lambda i: {"format": "csv"}),
+        "GET /api/v1/products/export": get("/api/v1/products/export", lambda i: {"format": "ndjson"}),
+        "GET /api/v1/aisles/export": get("/api/v1/aisles/export", lambda i: {"format": "csv"}),
+        "GET /api/v1/departments/export": get("/api/v1/departments/export", lambda i: {"format": "ndjson"}),
+    }
+    for hypothesis in range(1, 6):
+        scenarios[f"GET /analysis/hypothesis{hypothesis}"] = get(f"/analysis/hypothesis{hypothesis}")
+    scenarios["POST /api/v1/analysis/jobs"] = submit_job()
+    scenarios["GET /api/v1/analysis/jobs/{id}"] = read_job()
+    scenarios["GET /api/v1/analysis/jobs/{id}/events"] = read_job("/events")
+    if writes:
+        # Last, as writes invalidate the cached analysis results
+        for offset, collection in enumerate(NEW_DOCUMENTS):
+            first_id = 10 ** 9 * (offset + 1)
+            scenarios[f"PUT /api/v1/{collection}"] = update(collection, rows[collection])
+            scenarios[f"POST+DELETE /api/v1/{collection}"] = create_and_delete(collection, first_id)
+            scenarios[f"POST /api/v1/{collection}/bulk"] = bulk_insert_and_delete(collection, first_id)
+    return scenarios
+
+
+async def peak_rss_mb(client: httpx.AsyncClient) -> Optional[float]:
+    response = await client.get("/startup")
+    return response.json().get("peak_rss_mb") if response.status_code == 200 else None
+
+
+async def run_scenario(client: httpx.AsyncClient, step: Step, requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    # The first request runs alone, so cold starts (analysis loads, cache fills) are visible
+    started = time.perf_counter()
+    status = await step(client, 0)
+    first = time.perf_counter() - started
+    errors += status >= 400
+    indices = iter(range(1, requests))
+
+    async def worker():
+        nonlocal errors
+        for i in indices:
+            request_started = time.perf_counter()
+            try:
+                failed = await step(client, i) >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - request_started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "first_ms": first * 1000,
+        "throughput": len(latencies) / seconds if seconds else None,
+        "p50_ms": percentile(latencies, 0.5) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+        "max_ms": latencies[-1] * 1000 if latencies else None,
+        "peak_rss_mb": await peak_rss_mb(client),
+    }
+
+
+def git_commit() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+@contextlib.asynccontextmanager
+async def open_client(args):
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+            yield client
+        return
+    # Hypothesis pages should wait for their result rather than render the progress page
+    os.environ.setdefault("ANALYSIS_PAGE_WAIT", "3600")
+    from src.main.ui.main import app
+
+    async with app.router.lifespan_context(app):
+        if args.generate or args.fake:
+            sizes = await seed_database(app.state.db.database, args.orders, args.products, args.seed)
+            print("generated " + ", ".join(f"{name}={size}" for name, size in sizes.items()))
+            await app.state.db.ensure_indexes()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            yield client
+
+
+async def run(args) -> Dict[str, Any]:
+    report = {**git_commit(), "created_at": datetime.now(timezone.utc).isoformat(),
+              "args": {key: value for key, value in vars(args).items() if key != "output"}, "scenarios": {}}
+    async with open_client(args) as client:
+        scenarios = await build_scenarios(client, args.writes)
+        print(f"{'scenario':<40}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'first ms':>10}{'errors':>8}{'RSS MB':>8}")
+        for name, step in scenarios.items():
+            if args.only and args.only not in name:
+                continue
+            result = await run_scenario(client, step, args.requests, args.concurrency)
+            report["scenarios"][name] = result
+            print(f"{name:<40}{result['throughput'] or 0:>9.1f}{result['p50_ms'] or 0:>9.2f}"
+                  f"{result['p99_ms'] or 0:>9.2f}{result['first_ms']:>10.1f}{result['errors']:>8}"
+                  f"{result['peak_rss_mb'] or 0:>8.0f}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="benchmark a running server instead of the app in this process")
+    target.add_argument("--fake", action="store_true", help="use an in-process fake MongoDB")
+    parser.add_argument("--generate", action="store_true", help="replace the DB_CONN data with synthetic data")
+    parser.add_argument("--orders", type=int, default=10000, help="synthetic orders, with --fake or --generate")
+    parser.add_argument("--products", type=int, default=50000, help="synthetic products, with --fake or --generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--writes", action="store_true", help="also run the update, create/delete and bulk scenarios")
+    parser.add_argument("--only", help="only run scenarios whose name contains this text")
+    parser.add_argument("--output", help="report path, default benchmarks/results/<commit>.json")
+    args = parser.parse_args()
+    load_dotenv(find_dotenv())
+    if args.fake:
+        use_fake_mongo()
+
+    report = asyncio.run(run(args))
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{report['commit'] or 'report'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Check that the mongo aggregation backend gives the same results as the pandas backend.
+
+Run from the project root against the database in DB_CONN:
+
+    python -m benchmarks.pipelines
+
+Prints the time of each backend per hypothesis and exits non-zero when a result differs.
+tests/test_pipelines.py runs the same comparison on a fake MongoDB with synthetic data.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from dotenv import find_dotenv, load_dotenv
+
+from benchmarks.hypotheses import same_result
+from src.main.eda.pipelines import PIPELINES
+from src.main.eda.utils import DataAnalysis
+
+
+async def compare(conn_id: str) -> bool:
+    pandas_analysis = DataAnalysis(conn_id, backends={})
+    mongo_analysis = DataAnalysis(conn_id, backends={name: "mongo" for name in PIPELINES})
+    started = time.perf_counter()
+    await pandas_analysis.load_dataframes()
+    print(f"pandas frames loaded in {time.perf_counter() - started:.2f} s")
+    print(f"{'hypothesis':<22}{'pandas s':>10}{'mongo s':>10}  equal")
+    all_equal = True
+    for name in PIPELINES:
+        timings, results = [], []
+        for analysis in (pandas_analysis, mongo_analysis):
+            started = time.perf_counter()
+            results.append(await getattr(analysis, name)())
+            timings.append(time.perf_counter() - started)
+        equal = same_result(*results)
+        all_equal = all_equal and equal
+        print(f"{name:<22}{timings[0]:>10.3f}{timings[1]:>10.3f}  {equal}")
+        if not equal:
+            print(f"  pandas: {results[0]}\n  mongo:  {results[1]}")
+    return all_equal
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__.splitlines()[0]).parse_args()
+    load_dotenv(find_dotenv())
+    if not asyncio.run(compare(os.getenv("DB_CONN"))):
+        raise SystemExit("The mongo backend differs from the pandas backend")
+
+
+if __name__ == "__main__":
+    main()
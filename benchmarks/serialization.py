@@ -0,0 +1,96 @@
+"""Per-row cost of turning a page of order documents into a JSON response body.
+
+Run from the project root:
+
+    python -m benchmarks.serialization --rows 100
+
+"before" is the original path: an order_helper dict per document, jsonable_encoder over the page
+and Starlette's JSONResponse. "after" builds OrderRow dataclasses and renders the page with
+ORJSONResponse, as the list endpoints do now. Both bodies are checked to decode to the same JSON.
+"""
+import argparse
+import json
+import math
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from src.main.db.rows import OrderRow
+
+
+def legacy_order_helper(order) -> dict:
+    days_since_prior_order = order.get("days_since_prior_order")
+    if isinstance(days_since_prior_order, float) and math.isnan(days_since_prior_order):
+        days_since_prior_order = None
+    return {
+        "id": str(order["_id"]),
+        "order_id": order["order_id"],
+        "user_id": order["user_id"],
+        "eval_set": order["eval_set"],
+        "order_number": order["order_number"],
+        "order_dow": order["order_dow"],
+        "order_hour_of_day": order["order_hour_of_day"],
+        "days_since_prior_order": days_since_prior_order,
+    }
+
+
+def synthetic_orders(n_rows: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [{
+        "_id": ObjectId(),
+        "order_id": i,
+        "user_id": rng.randint(1, 200000),
+        "eval_set": rng.choice(["prior", "train", "test"]),
+        "order_number": rng.randint(1, 100),
+        "order_dow": rng.randint(0, 6),
+        "order_hour_of_day": rng.randint(0, 23),
+        # First orders of a user have no previous order
+        "days_since_prior_order": float("nan") if i % 10 == 0 else float(rng.randint(0, 30)),
+    } for i in range(1, n_rows + 1)]
+
+
+def page(rows: List[Any]) -> Dict[str, Any]:
+    return {"total": 3421083, "total_exact": False, "skip": 0, "limit": len(rows), "next_cursor": None,
+            "orders": rows}
+
+
+def before(documents: List[Dict[str, Any]]) -> bytes:
+    return JSONResponse(jsonable_encoder(page([legacy_order_helper(document) for document in documents]))).body
+
+
+def after(documents: List[Dict[str, Any]]) -> bytes:
+    return ORJSONResponse(page([OrderRow.from_document(document) for document in documents])).body
+
+
+def timed(function: Callable[[], Any], repeat: int) -> tuple:
+    best, result = math.inf, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    documents = synthetic_orders(args.rows)
+    before_seconds, before_body = timed(lambda: before(documents), args.repeat)
+    after_seconds, after_body = timed(lambda: after(documents), args.repeat)
+    if json.loads(before_body) != json.loads(after_body):
+        raise SystemExit("The two paths produce different JSON")
+    print(f"{args.rows} rows per page, best of {args.repeat}")
+    for name, seconds in (("before", before_seconds), ("after", after_seconds)):
+        print(f"{name:>6}: {seconds * 1e6 / args.rows:8.2f} us/row  {seconds * 1e3:7.3f} ms/page")
+    print(f"speedup: {before_seconds / after_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,284 +1,458 @@
-from typing import Any, Mapping, List, Dict
+from typing import Any, AsyncIterator, Callable, List, Dict, Optional, Set, Union
+
+import asyncio
+import base64
+import binascii
 
 from bson import ObjectId
-from motor.motor_asyncio import AsyncIOMotorClient
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 import logging
-
-import math
-
-
-def order_helper(order) -> dict:
-    days_since_prior_order = order.get("days_since_prior_order")
-    if isinstance(days_since_prior_order, float) and math.isnan(days_since_prior_order):
-        days_since_prior_order = None
-    return {
-        "id": str(order["_id"]),
-        "order_id": order["order_id"],
-        "user_id": order["user_id"],
-        "eval_set": order["eval_set"],
-        "order_number": order["order_number"],
-        "order_dow": order["order_dow"],
-        "order_hour_of_day": order["order_hour_of_day"],
-        "days_since_prior_order": days_since_prior_order,
-    }
-
-
-def aisle_helper(aisle) -> dict:
-    return {
-        "id": str(aisle["_id"]),
-        "aisle_id": aisle["aisle_id"],
-        "aisle": aisle["aisle"]
-    }
-
-
-def department_helper(department) -> dict:
-    return {
-        "id": str(department["_id"]),
-        "department_id": department["department_id"],
-        "department": department["department"]
-    }
-
-
-def product_helper(product) -> dict:
-    return {
-        "id": str(product["_id"]),
-        "product_id": product["product_id"],
-        "product_name": product["product_name"],
-        "aisle_id": product["aisle_id"],
-        "department_id": product["department_id"]
-    }
-
-
-def order_helper(order) -> dict:
-    days_since_prior_order = order.get("days_since_prior_order")
-    if isinstance(days_since_prior_order, float) and math.isnan(days_since_prior_order):
-        days_since_prior_order = None
-    return {
-        "id": str(order["_id"]),
-        "order_id": order["order_id"],
-        "user_id": order["user_id"],
-        "eval_set": order["eval_set"],
-        "order_number": order["order_number"],
-        "order_dow": order["order_dow"],
-        "order_hour_of_day": order["order_hour_of_day"],
-        "days_since_prior_order": days_since_prior_order,
-    }
+import os
+import time
+
+from src.main.db.counts import CountMode, DocumentCounter, parse_count_modes
+from src.main.db.events import ChangeEvent, publish
+from src.main.db.indexes import ORDER_PRODUCTS_COVERING_INDEX, ensure_indexes, summarize_explain
+from src.main.db.lookups import CacheMode, DocumentCache, parse_cache_modes
+from src.main.db.monitoring import CommandMetrics
+from src.main.db.rows import AisleRow, DepartmentRow, OrderProductRow, OrderRow, ProductRow
+
+DATAFRAME_BATCH_SIZE = int(os.getenv("DB_DATAFRAME_BATCH_SIZE", "50000"))
+# Holds one {_id: collection name, version: n} document per collection, bumped on every write made here
+VERSIONS_COLLECTION = "collection_versions"
+# Finished background analysis jobs, see src/main/eda/jobs.py
+JOBS_COLLECTION = "analysis_jobs"
+# Data fields of each collection, in the order they are loaded and exported
+COLLECTION_FIELDS: Dict[str, List[str]] = {
+    "orders": ["order_id", "user_id", "eval_set", "order_number", "order_dow", "order_hour_of_day",
+               "days_since_prior_order"],
+    "orders_train": ["order_id", "product_id", "add_to_cart_order", "reordered"],
+    "products": ["product_id", "product_name", "aisle_id", "department_id"],
+    "aisles": ["aisle_id", "aisle"],
+    "departments": ["department_id", "department"],
+}
+ROW_TYPES = {"orders": OrderRow, "orders_train": OrderProductRow, "aisles": AisleRow,
+             "departments": DepartmentRow, "products": ProductRow}
+
+
+# Environment variable -> (MongoClient option, type)
+CLIENT_OPTIONS_ENV = {
+    "DB_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "DB_MIN_POOL_SIZE": ("minPoolSize", int),
+    "DB_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "DB_CONNECT_TIMEOUT_MS": ("connectTimeoutMS", int),
+    "DB_SOCKET_TIMEOUT_MS": ("socketTimeoutMS", int),
+    "DB_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", int),
+    "DB_COMPRESSORS": ("compressors", str),
+    "DB_READ_PREFERENCE": ("readPreference", str),
+}
+
+
+def client_options_from_env() -> Dict[str, Any]:
+    """MongoClient pool, timeout, compression and read preference options set in the environment."""
+    options = {}
+    for variable, (option, cast) in CLIENT_OPTIONS_ENV.items():
+        value = os.getenv(variable)
+        if value:
+            options[option] = cast(value)
+    return options
+
+
+def encode_cursor(last_id: ObjectId) -> str:
+    return base64.urlsafe_b64encode(last_id.binary).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ObjectId:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return ObjectId(raw)
+    except (binascii.Error, InvalidId, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def columns_of(documents: List[Dict[str, Any]], fields: List[str]) -> Dict[str, List[Any]]:
+    return {field: [document.get(field) for document in documents] for field in fields}
 
 
 class DBConnector:
-    def __init__(self, conn_id: str, db_name: str = "instacart_db"):
+    def __init__(self, conn_id: str, db_name: str = "instacart_db",
+                 count_modes: Optional[Dict[str, CountMode]] = None,
+                 client_options: Optional[Dict[str, Any]] = None,
+                 cache_modes: Optional[Dict[str, CacheMode]] = None):
         if conn_id and conn_id.startswith("mongodb"):
             try:
                 self.conn_id = conn_id
-                self.client = AsyncIOMotorClient(conn_id)
+                if client_options is None:
+                    client_options = client_options_from_env()
+                self.client = AsyncIOMotorClient(conn_id, event_listeners=[CommandMetrics()], **client_options)
                 self.database = self.client[db_name]
                 self.orders_collection = self.database.get_collection('orders')
                 self.orders_train_collection = self.database.get_collection("orders_train")
                 self.aisles_collection = self.database.get_collection('aisles')
                 self.departments_collection = self.database.get_collection('departments')
                 self.products_collection = self.database.get_collection('products')
+                self.versions_collection = self.database.get_collection(VERSIONS_COLLECTION)
+                self.jobs_collection = self.database.get_collection(JOBS_COLLECTION)
+                if count_modes is None:
+                    count_modes = parse_count_modes(os.getenv("DB_COUNT_MODES"))
+                self.collections = {
+                    collection.name: collection
+                    for collection in (self.orders_collection, self.orders_train_collection,
+                                       self.aisles_collection, self.departments_collection,
+                                       self.products_collection)
+                }
+                self.counters = {
+                    name: DocumentCounter(collection, count_modes.get(name, CountMode.EXACT))
+                    for name, collection in self.collections.items()
+                }
+                if cache_modes is None:
+                    cache_modes = parse_cache_modes(os.getenv("DB_CACHE_MODES"))
+                # Index names per collection, filled by ensure_indexes()
+                self.indexes: Dict[str, List[str]] = {}
+                self.caches = {
+                    name: DocumentCache(collection, ROW_TYPES[name].from_document,
+                                        cache_modes.get(name, CacheMode.NONE))
+                    for name, collection in self.collections.items()
+                }
+                # With several processes writing (src/main/serve.py), caches and counters are checked
+                # against the collection versions at most every DB_CACHE_REVALIDATE seconds (0: never)
+                self.revalidate_interval = float(os.getenv("DB_CACHE_REVALIDATE", "0"))
+                self._seen_versions: Optional[Dict[str, int]] = None
+                self._revalidated_at = 0.0
+                # Version bumps of recent writes still in flight, see _record_write
+                self._version_bumps: Set[asyncio.Task] = set()
             except Exception as e:
                 logging.error(f"Error on creating connector: {str(e)}")
                 raise
         else:
             raise ValueError("conn_id is not valid")
 
-    async def retrieve_orders(self, skip: int = 0, limit: int = 10) -> dict:
-        orders = []
-        cursor = self.orders_collection.find().skip(skip).limit(limit)
-        async for order in cursor:
-            orders.append(order_helper(order))
-        total_orders = await self.orders_collection.count_documents({})
+    def close(self):
+        self.client.close()
+
+    async def ensure_indexes(self) -> Dict[str, List[str]]:
+        self.indexes = await ensure_indexes(self.database)
+        return self.indexes
+
+    def _page_query(self, collection: AsyncIOMotorCollection, filters: Optional[Dict[str, Any]],
+                    skip: int, limit: int, cursor: Optional[str]):
+        filters = dict(filters or {})
+        # Only the fields of the row are sent back by the server
+        projection = {field: 1 for field in COLLECTION_FIELDS[collection.name]}
+        # With a cursor we seek on the _id index instead of walking past `skip` documents
+        if cursor:
+            filters["_id"] = {"$gt": decode_cursor(cursor)}
+            query = collection.find(filters, projection)
+        else:
+            query = collection.find(filters, projection).skip(skip)
+        return query.sort("_id", 1).limit(limit)
+
+    async def _revalidate(self):
+        """Drop the cached documents and counts of collections whose version changed, e.g. by another worker."""
+        if not self.revalidate_interval or time.monotonic() - self._revalidated_at < self.revalidate_interval:
+            return
+        # Set before the query, so concurrent requests do not all send it
+        self._revalidated_at = time.monotonic()
+        versions = await self.get_collection_versions()
+        if self._seen_versions is not None:
+            for name in self.collections:
+                if versions[name] != self._seen_versions.get(name):
+                    self.caches[name].invalidate()
+                    self.counters[name].invalidate()
+        self._seen_versions = versions
+
+    async def _cached(self, collection_name: str, id: str) -> Any:
+        await self._revalidate()
+        return await self.caches[collection_name].get(id)
+
+    async def _count(self, collection: AsyncIOMotorCollection, filters: Optional[Dict[str, Any]]):
+        if filters:
+            return await collection.count_documents(filters), True
+        await self._revalidate()
+        return await self.counters[collection.name].count()
+
+    async def _retrieve_page(self, collection: AsyncIOMotorCollection, make_row: Callable[[dict], Any], key: str,
+                             skip: int, limit: int, cursor: Optional[str],
+                             include_total: bool = True,
+                             filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        query = self._page_query(collection, filters, skip, limit, cursor)
+
+        async def fetch_page() -> List[dict]:
+            return [document async for document in query]
+
+        # The page and the total are independent, so both round trips go out together
+        if include_total:
+            documents, (total, total_exact) = await asyncio.gather(
+                fetch_page(), self._count(collection, filters)
+            )
+        else:
+            documents = await fetch_page()
+            total, total_exact = None, False
+        next_cursor = encode_cursor(documents[-1]["_id"]) if len(documents) == limit else None
         return {
-            "total": total_orders,
-            "skip": skip,
+            "total": total,
+            "total_exact": total_exact,
+            "skip": 0 if cursor else skip,
             "limit": limit,
-            "orders": orders
+            "next_cursor": next_cursor,
+            key: [make_row(document) for document in documents]
         }
 
-    async def retrieve_order(self, id: str) -> Mapping[str, Any] | None:
-        order = await self.orders_collection.find_one({"_id": ObjectId(id)})
-        if order:
-            return order_helper(order)
-        return None
-
-    async def add_order(self, order_data: dict) -> dict:
-        order = await self.orders_collection.insert_one(order_data)
-        new_order = await self.orders_collection.find_one({"_id": order.inserted_id})
-        return order_helper(new_order)
-
-    async def update_order(self, id: str, data: dict) -> bool:
+    async def _bump_version(self, collection_name: str):
+        try:
+            await self.versions_collection.update_one(
+                {"_id": collection_name}, {"$inc": {"version": 1}}, upsert=True
+            )
+        except Exception as e:
+            logging.error(f"Could not bump the version of {collection_name}: {str(e)}")
+
+    async def _record_write(self, collection_name: str, operation: str, document: Optional[dict] = None,
+                            count_delta: int = 0):
+        self.counters[collection_name].adjust(count_delta)
+        self.caches[collection_name].apply(operation, document)
+        # The bump still goes out after the write, but the response does not wait for its round trip
+        task = asyncio.ensure_future(self._bump_version(collection_name))
+        self._version_bumps.add(task)
+        task.add_done_callback(self._version_bumps.discard)
+        publish(ChangeEvent(collection_name, operation, document))
+
+    # Single-document writes shared by the collections, answered with their ROW_TYPES row
+    async def _insert(self, collection_name: str, data: dict) -> Any:
+        result = await self.collections[collection_name].insert_one(data)
+        # The response is built from the inserted document instead of reading it back
+        document = {**data, "_id": result.inserted_id}
+        await self._record_write(collection_name, "insert", document, count_delta=1)
+        return ROW_TYPES[collection_name].from_document(document)
+
+    async def _update(self, collection_name: str, id: str, data: dict) -> Any:
         if len(data) < 1:
-            return False
-        result = await self.orders_collection.update_one(
-            {"_id": ObjectId(id)}, {"$set": data}
+            return None
+        document = await self.collections[collection_name].find_one_and_update(
+            {"_id": ObjectId(id)}, {"$set": data}, return_document=ReturnDocument.AFTER
         )
-        return result.modified_count > 0
+        if document:
+            await self._record_write(collection_name, "update", document)
+            return ROW_TYPES[collection_name].from_document(document)
+        return None
+
+    async def _delete(self, collection_name: str, id: str) -> bool:
+        # find_one_and_delete hands back the removed document so subscribers can drop it
+        document = await self.collections[collection_name].find_one_and_delete({"_id": ObjectId(id)})
+        if document:
+            await self._record_write(collection_name, "delete", document, count_delta=-1)
+        return document is not None
+
+    async def flush_versions(self):
+        """Wait for the version bumps of the writes made so far."""
+        if self._version_bumps:
+            await asyncio.gather(*list(self._version_bumps))
+
+    async def explain_page(self, collection_name: str, skip: int = 0, limit: int = 10,
+                           cursor: Optional[str] = None,
+                           filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Plan of the query a list endpoint would run: indexes used, documents examined, covered or not."""
+        query = self._page_query(self.collections[collection_name], filters, skip, limit, cursor)
+        return summarize_explain(await query.explain())
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: cache.stats() for name, cache in self.caches.items() if cache.mode != CacheMode.NONE}
+
+    async def get_collection_versions(self) -> Dict[str, int]:
+        # The versions read by this process always include its own writes
+        await self.flush_versions()
+        versions = {name: 0 for name in self.collections}
+        async for document in self.versions_collection.find():
+            versions[document["_id"]] = document["version"]
+        return versions
+
+    async def retrieve_orders(self, skip: int = 0, limit: int = 10,
+                              cursor: Optional[str] = None, include_total: bool = True,
+                              filters: Optional[Dict[str, Any]] = None) -> dict:
+        return await self._retrieve_page(self.orders_collection, OrderRow.from_document, "orders",
+                                         skip, limit, cursor, include_total, filters)
+
+    async def retrieve_order(self, id: str) -> Optional[OrderRow]:
+        return await self._cached("orders", id)
+
+    async def add_order(self, order_data: dict) -> OrderRow:
+        return await self._insert("orders", order_data)
+
+    async def update_order(self, id: str, data: dict) -> Optional[OrderRow]:
+        return await self._update("orders", id, data)
 
     async def delete_order(self, id: str) -> bool:
-        result = await self.orders_collection.delete_one({"_id": ObjectId(id)})
-        return result.deleted_count > 0
-
-    async def retrieve_aisles(self, skip: int = 0, limit: int = 10) -> Dict[str, Any]:
-        aisles = []
-        cursor = self.aisles_collection.find().skip(skip).limit(limit)
-        async for aisle in cursor:
-            aisles.append(aisle_helper(aisle))
-        total_aisles = await self.aisles_collection.count_documents({})
-        return {
-            "total": total_aisles,
-            "skip": skip,
-            "limit": limit,
-            "aisles": aisles
-        }
+        return await self._delete("orders", id)
 
-    async def retrieve_aisle(self, id: str) -> Mapping[str, Any]:
-        aisle = await self.aisles_collection.find_one({"_id": ObjectId(id)})
-        if aisle:
-            return aisle_helper(aisle)
-        return None
+    async def retrieve_aisles(self, skip: int = 0, limit: int = 10,
+                              cursor: Optional[str] = None, include_total: bool = True,
+                              filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self._retrieve_page(self.aisles_collection, AisleRow.from_document, "aisles",
+                                         skip, limit, cursor, include_total, filters)
 
-    async def add_aisle(self, aisle_data: dict) -> dict:
-        aisle = await self.aisles_collection.insert_one(aisle_data)
-        new_aisle = await self.aisles_collection.find_one({"_id": aisle.inserted_id})
-        return aisle_helper(new_aisle)
+    async def retrieve_aisle(self, id: str) -> Optional[AisleRow]:
+        return await self._cached("aisles", id)
 
-    async def update_aisle(self, id: str, data: dict) -> bool:
-        if len(data) < 1:
-            return False
-        result = await self.aisles_collection.update_one(
-            {"_id": ObjectId(id)}, {"$set": data}
-        )
-        return result.modified_count > 0
+    async def add_aisle(self, aisle_data: dict) -> AisleRow:
+        return await self._insert("aisles", aisle_data)
+
+    async def update_aisle(self, id: str, data: dict) -> Optional[AisleRow]:
+        return await self._update("aisles", id, data)
 
     async def delete_aisle(self, id: str) -> bool:
-        result = await self.aisles_collection.delete_one({"_id": ObjectId(id)})
-        return result.deleted_count > 0
+        return await self._delete("aisles", id)
 
     # Departments CRUD methods
-    async def retrieve_departments(self, skip: int = 0, limit: int = 10) -> Dict[str, Any]:
-        departments = []
-        cursor = self.departments_collection.find().skip(skip).limit(limit)
-        async for department in cursor:
-            departments.append(department_helper(department))
-        total_departments = await self.departments_collection.count_documents({})
-        return {
-            "total": total_departments,
-            "skip": skip,
-            "limit": limit,
-            "departments": departments
-        }
+    async def retrieve_departments(self, skip: int = 0, limit: int = 10,
+                                   cursor: Optional[str] = None, include_total: bool = True,
+                                   filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self._retrieve_page(self.departments_collection, DepartmentRow.from_document, "departments",
+                                         skip, limit, cursor, include_total, filters)
 
-    async def retrieve_department(self, id: str) -> Mapping[str, Any]:
-        department = await self.departments_collection.find_one({"_id": ObjectId(id)})
-        if department:
-            return department_helper(department)
-        return None
+    async def retrieve_department(self, id: str) -> Optional[DepartmentRow]:
+        return await self._cached("departments", id)
 
-    async def add_department(self, department_data: dict) -> dict:
-        department = await self.departments_collection.insert_one(department_data)
-        new_department = await self.departments_collection.find_one({"_id": department.inserted_id})
-        return department_helper(new_department)
+    async def add_department(self, department_data: dict) -> DepartmentRow:
+        return await self._insert("departments", department_data)
 
-    async def update_department(self, id: str, data: dict) -> bool:
-        if len(data) < 1:
-            return False
-        result = await self.departments_collection.update_one(
-            {"_id": ObjectId(id)}, {"$set": data}
-        )
-        return result.modified_count > 0
+    async def update_department(self, id: str, data: dict) -> Optional[DepartmentRow]:
+        return await self._update("departments", id, data)
 
     async def delete_department(self, id: str) -> bool:
-        result = await self.departments_collection.delete_one({"_id": ObjectId(id)})
-        return result.deleted_count > 0
+        return await self._delete("departments", id)
 
     # Products CRUD methods
-    async def retrieve_products(self, skip: int = 0, limit: int = 10) -> Dict[str, Any]:
-        products = []
-        cursor = self.products_collection.find().skip(skip).limit(limit)
-        async for product in cursor:
-            products.append(product_helper(product))
-        total_products = await self.products_collection.count_documents({})
-        return {
-            "total": total_products,
-            "skip": skip,
-            "limit": limit,
-            "products": products
-        }
+    async def retrieve_products(self, skip: int = 0, limit: int = 10,
+                                cursor: Optional[str] = None, include_total: bool = True,
+                                filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self._retrieve_page(self.products_collection, ProductRow.from_document, "products",
+                                         skip, limit, cursor, include_total, filters)
 
-    async def retrieve_product(self, id: str) -> Mapping[str, Any]:
-        product = await self.products_collection.find_one({"_id": ObjectId(id)})
-        if product:
-            return product_helper(product)
-        return None
+    async def retrieve_product(self, id: str) -> Optional[ProductRow]:
+        return await self._cached("products", id)
 
-    async def add_product(self, product_data: dict) -> dict:
-        product = await self.products_collection.insert_one(product_data)
-        new_product = await self.products_collection.find_one({"_id": product.inserted_id})
-        return product_helper(new_product)
+    async def add_product(self, product_data: dict) -> ProductRow:
+        return await self._insert("products", product_data)
 
-    async def update_product(self, id: str, data: dict) -> bool:
-        if len(data) < 1:
-            return False
-        result = await self.products_collection.update_one(
-            {"_id": ObjectId(id)}, {"$set": data}
-        )
-        return result.modified_count > 0
+    async def update_product(self, id: str, data: dict) -> Optional[ProductRow]:
+        return await self._update("products", id, data)
 
     async def delete_product(self, id: str) -> bool:
-        result = await self.products_collection.delete_one({"_id": ObjectId(id)})
-        return result.deleted_count > 0
-
-    async def get_orders_dataframe(self) -> List[Dict[str, Any]]:
-        cursor = self.orders_collection.find({}, {
-            "_id": 0,
-            "order_id": 1,
-            "user_id": 1,
-            "eval_set": 1,
-            "order_number": 1,
-            "order_dow": 1,
-            "order_hour_of_day": 1,
-            "days_since_prior_order": 1
-        })
-        orders = await cursor.to_list(length=10000)
-        return orders
-
-    async def get_order_products_dataframe(self) -> List[Dict[str, Any]]:
-        cursor = self.orders_train_collection.find({}, {
-            "_id": 0,
-            "order_id": 1,
-            "product_id": 1,
-            "add_to_cart_order": 1,
-            "reordered": 1
-        })
-        order_products = await cursor.to_list(length=10000)
-        return order_products
-
-    async def get_products_dataframe(self) -> List[Dict[str, Any]]:
-        cursor = self.products_collection.find({}, {
-            "_id": 0,
-            "product_id": 1,
-            "product_name": 1,
-            "aisle_id": 1,
-            "department_id": 1
-        })
-        products = await cursor.to_list(length=10000)
-        return products
-
-    async def get_aisles_dataframe(self) -> List[Dict[str, Any]]:
-        cursor = self.aisles_collection.find({}, {
-            "_id": 0,
-            "aisle_id": 1,
-            "aisle": 1
-        })
-        aisles = await cursor.to_list(length=1000)
-        return aisles
-
-    async def get_departments_dataframe(self) -> List[Dict[str, Any]]:
-        cursor = self.departments_collection.find({}, {
-            "_id": 0,
-            "department_id": 1,
-            "department": 1
-        })
-        departments = await cursor.to_list(length=10000)
-        return departments
+        return await self._delete("products", id)
+
+    # Bulk write shared by all collections
+    async def bulk_write(self, collection_name: str, operations: List[Union[InsertOne, UpdateOne, DeleteOne]],
+                         ordered: bool = True) -> Dict[str, Any]:
+        """Send one bulk_write batch and report which operations failed or were not executed.
+
+        `errors` maps the position of an operation in `operations` to its error message. With
+        ordered=True the server stops at the first error, so every later position is listed in
+        `skipped`.
+        """
+        if not operations:
+            return {"inserted": 0, "modified": 0, "deleted": 0, "errors": {}, "skipped": []}
+        collection = self.collections[collection_name]
+        errors: Dict[int, str] = {}
+        skipped: List[int] = []
+        try:
+            result = await collection.bulk_write(operations, ordered=ordered)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for write_error in details.get("writeErrors", []):
+                errors[write_error["index"]] = write_error.get("errmsg", "write error")
+            if ordered and errors:
+                skipped = list(range(max(errors) + 1, len(operations)))
+        if details.get("nInserted", 0) or details.get("nModified", 0) or details.get("nRemoved", 0):
+            await self._record_write(collection_name, "bulk",
+                                     count_delta=details.get("nInserted", 0) - details.get("nRemoved", 0))
+        return {
+            "inserted": details.get("nInserted", 0),
+            "modified": details.get("nModified", 0),
+            "deleted": details.get("nRemoved", 0),
+            "errors": errors,
+            "skipped": skipped
+        }
+
+    async def aggregate(self, collection_name: str, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        cursor = self.collections[collection_name].aggregate(pipeline, allowDiskUse=True)
+        return await cursor.to_list(length=None)
+
+    # Analysis jobs
+    async def insert_analysis_job(self, job: dict, active_key: str):
+        """Store a new job as the one computing `active_key`; raises DuplicateKeyError if another one already is."""
+        await self.jobs_collection.insert_one({**job, "_id": job["id"], "active_key": active_key})
+
+    async def update_analysis_job(self, job_id: str, fields: dict, expected: Optional[dict] = None,
+                                  release: bool = False) -> bool:
+        """Set `fields` of a job if it still matches `expected`; `release` frees its key for a new job."""
+        update: Dict[str, Any] = {"$set": fields}
+        if release:
+            update["$unset"] = {"active_key": ""}
+        result = await self.jobs_collection.update_one({"_id": job_id, **(expected or {})}, update)
+        return result.matched_count > 0
+
+    async def find_analysis_job(self, query: dict) -> Optional[dict]:
+        job = await self.jobs_collection.find_one(query, {"_id": 0, "active_key": 0})
+        return job
+
+    # Column batches for the analysis DataFrames
+    async def _iter_column_batches(self, collection: AsyncIOMotorCollection, fields: List[str],
+                                   batch_size: int, hint: Optional[str] = None) -> AsyncIterator[Dict[str, List[Any]]]:
+        """Stream a whole collection as {field: values} batches of at most `batch_size` documents.
+
+        Only one batch of documents is alive at a time, so callers can build columnar chunks
+        without ever holding the full collection as dicts.
+        """
+        projection = {"_id": 0, **{field: 1 for field in fields}}
+        cursor = collection.find({}, projection).batch_size(batch_size)
+        if hint:
+            cursor = cursor.hint(hint)
+        while True:
+            documents = await cursor.to_list(length=batch_size)
+            if not documents:
+                break
+            # Transposed in a thread, as a batch can hold many thousands of documents
+            yield await asyncio.to_thread(columns_of, documents, fields)
+
+    def iter_orders_batches(self, batch_size: int = DATAFRAME_BATCH_SIZE,
+                            fields: Optional[List[str]] = None) -> AsyncIterator[Dict[str, List[Any]]]:
+        return self._iter_column_batches(self.orders_collection, fields or COLLECTION_FIELDS["orders"], batch_size)
+
+    def iter_order_products_batches(self, batch_size: int = DATAFRAME_BATCH_SIZE,
+                                    fields: Optional[List[str]] = None) -> AsyncIterator[Dict[str, List[Any]]]:
+        # With the covering index the load reads index keys only and never touches the documents
+        hint = None
+        if ORDER_PRODUCTS_COVERING_INDEX in self.indexes.get("orders_train", []):
+            hint = ORDER_PRODUCTS_COVERING_INDEX
+        return self._iter_column_batches(self.orders_train_collection, fields or COLLECTION_FIELDS["orders_train"],
+                                         batch_size, hint)
+
+    def iter_products_batches(self, batch_size: int = DATAFRAME_BATCH_SIZE,
+                              fields: Optional[List[str]] = None) -> AsyncIterator[Dict[str, List[Any]]]:
+        return self._iter_column_batches(self.products_collection, fields or COLLECTION_FIELDS["products"], batch_size)
+
+    def iter_aisles_batches(self, batch_size: int = DATAFRAME_BATCH_SIZE,
+                            fields: Optional[List[str]] = None) -> AsyncIterator[Dict[str, List[Any]]]:
+        return self._iter_column_batches(self.aisles_collection, fields or COLLECTION_FIELDS["aisles"], batch_size)
+
+    def iter_departments_batches(self, batch_size: int = DATAFRAME_BATCH_SIZE,
+                                 fields: Optional[List[str]] = None) -> AsyncIterator[Dict[str, List[Any]]]:
+        return self._iter_column_batches(self.departments_collection, fields or COLLECTION_FIELDS["departments"],
+                                         batch_size)
+
+    async def iter_row_batches(self, collection_name: str, batch_size: int) -> AsyncIterator[List[List[Any]]]:
+        """Stream a whole collection as batches of rows: the document id followed by COLLECTION_FIELDS."""
+        fields = COLLECTION_FIELDS[collection_name]
+        cursor = self.collections[collection_name].find({}, {field: 1 for field in fields}).batch_size(batch_size)
+        try:
+            while True:
+                documents = await cursor.to_list(length=batch_size)
+                if not documents:
+                    break
+                yield [[str(document["_id"]), *(document.get(field) for field in fields)] for document in documents]
+        finally:
+            # The client may disconnect halfway through an export
+            await cursor.close()
@@ -0,0 +1,70 @@
+import os
+import time
+from enum import Enum
+from typing import Dict, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+
+class CountMode(str, Enum):
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    CACHED = "cached"
+    COUNTER = "counter"
+
+
+DEFAULT_COUNT_MODES: Dict[str, CountMode] = {
+    "orders": CountMode.ESTIMATED,
+    "orders_train": CountMode.ESTIMATED,
+    "products": CountMode.CACHED,
+}
+
+
+def parse_count_modes(value: Optional[str]) -> Dict[str, CountMode]:
+    """Parse a `collection=mode,...` string such as the DB_COUNT_MODES env variable."""
+    modes = dict(DEFAULT_COUNT_MODES)
+    if not value:
+        return modes
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, mode = item.partition("=")
+        modes[name.strip()] = CountMode(mode.strip())
+    return modes
+
+
+class DocumentCounter:
+    """Total document count of a collection served according to a CountMode.
+
+    exact     - count_documents({}) on every call
+    estimated - estimated_document_count() from collection metadata
+    cached    - exact count refreshed every `ttl` seconds, adjusted by local writes in between
+    counter   - exact count taken once, then maintained by local writes only
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, mode: CountMode = CountMode.EXACT,
+                 ttl: Optional[float] = None):
+        self.collection = collection
+        self.mode = CountMode(mode)
+        self.ttl = ttl if ttl is not None else float(os.getenv("DB_COUNT_TTL", "30"))
+        self._value: Optional[int] = None
+        self._refreshed_at = 0.0
+
+    async def count(self) -> Tuple[int, bool]:
+        """Return the total and whether it is an exact count."""
+        if self.mode == CountMode.EXACT:
+            return await self.collection.count_documents({}), True
+        if self.mode == CountMode.ESTIMATED:
+            return await self.collection.estimated_document_count(), False
+        expired = self.mode == CountMode.CACHED and time.monotonic() - self._refreshed_at > self.ttl
+        if self._value is None or expired:
+            self._value = await self.collection.count_documents({})
+            self._refreshed_at = time.monotonic()
+        return self._value, False
+
+    def adjust(self, delta: int):
+        if self._value is not None:
+            self._value += delta
+
+    def invalidate(self):
+        self._value = None
@@ -0,0 +1,30 @@
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+
+class ChangeEvent(NamedTuple):
+    collection: str
+    # insert, update, delete or bulk; bulk events carry no document
+    operation: str
+    document: Optional[Dict[str, Any]] = None
+
+
+_subscribers: List[Callable[[ChangeEvent], None]] = []
+
+
+def subscribe(callback: Callable[[ChangeEvent], None]):
+    _subscribers.append(callback)
+
+
+def unsubscribe(callback: Callable[[ChangeEvent], None]):
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+
+def publish(event: ChangeEvent):
+    """Deliver a write made by any DBConnector in this process to every subscriber."""
+    for callback in list(_subscribers):
+        try:
+            callback(event)
+        except Exception as e:
+            logging.error(f"Error on handling {event.operation} event for {event.collection}: {str(e)}")
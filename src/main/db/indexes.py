@@ -0,0 +1,88 @@
+import json
+import logging
+from typing import Any, Dict, List
+
+from bson import json_util
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+# Index name of orders_train that holds every field the order_products DataFrame reads, so its load
+# can be answered from the index alone
+ORDER_PRODUCTS_COVERING_INDEX = "order_products_covering"
+
+# Indexes the connector relies on, per collection
+INDEXES: Dict[str, List[IndexModel]] = {
+    "orders": [
+        IndexModel([("order_id", ASCENDING)], name="order_id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("order_number", ASCENDING)], name="user_id_order_number"),
+    ],
+    "orders_train": [
+        IndexModel([("order_id", ASCENDING), ("product_id", ASCENDING), ("add_to_cart_order", ASCENDING),
+                    ("reordered", ASCENDING)], name=ORDER_PRODUCTS_COVERING_INDEX),
+        IndexModel([("product_id", ASCENDING)], name="product_id"),
+    ],
+    "products": [
+        IndexModel([("product_id", ASCENDING)], name="product_id_unique", unique=True),
+        IndexModel([("aisle_id", ASCENDING)], name="aisle_id"),
+        IndexModel([("department_id", ASCENDING)], name="department_id"),
+    ],
+    "aisles": [
+        IndexModel([("aisle_id", ASCENDING)], name="aisle_id_unique", unique=True),
+    ],
+    "departments": [
+        IndexModel([("department_id", ASCENDING)], name="department_id_unique", unique=True),
+    ],
+    "analysis_jobs": [
+        # Held by the queued, running and done job of each key, so concurrent workers cannot start a second one
+        IndexModel([("active_key", ASCENDING)], name="active_key_unique", unique=True, sparse=True),
+    ],
+}
+
+
+async def ensure_indexes(database: AsyncIOMotorDatabase) -> Dict[str, List[str]]:
+    """Create the missing INDEXES and return the names that exist afterwards, per collection.
+
+    An index that cannot be built (e.g. a unique index over duplicated data) is logged and left
+    out, so the app still starts.
+    """
+    ready: Dict[str, List[str]] = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = database.get_collection(collection_name)
+        ready[collection_name] = []
+        for index in indexes:
+            try:
+                ready[collection_name].extend(await collection.create_indexes([index]))
+            except OperationFailure as e:
+                logging.error(f"Could not create index {index.document['name']} on {collection_name}: {str(e)}")
+    return ready
+
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a find explain() output to the indexes used and whether the query was covered."""
+    planner = explain.get("queryPlanner", {})
+    stats = explain.get("executionStats", {})
+    stages: List[str] = []
+    indexes: List[str] = []
+    stage = planner.get("winningPlan", {})
+    while stage:
+        # Plans are nested stage -> inputStage; SBE plans keep the classic tree under queryPlan
+        stage = stage.get("queryPlan", stage)
+        stages.append(stage.get("stage"))
+        if stage.get("indexName"):
+            indexes.append(stage["indexName"])
+        stage = stage.get("inputStage") or (stage.get("inputStages") or [None])[0]
+    return {
+        "namespace": planner.get("namespace"),
+        # Extended JSON, as the filter can hold ObjectIds
+        "filter": json.loads(json_util.dumps(planner.get("parsedQuery", {}))),
+        "stages": stages,
+        "indexes": indexes,
+        # A covered query is answered from an index without reading any document
+        "covered": bool(indexes) and "FETCH" not in stages and "COLLSCAN" not in stages
+                   and stats.get("totalDocsExamined", 0) == 0,
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "returned": stats.get("nReturned"),
+        "millis": stats.get("executionTimeMillis"),
+    }
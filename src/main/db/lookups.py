@@ -0,0 +1,121 @@
+import asyncio
+import os
+import time
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from src.main.cache import LRUCache
+
+
+class CacheMode(str, Enum):
+    NONE = "none"
+    LRU = "lru"
+    RESIDENT = "resident"
+
+
+DEFAULT_CACHE_MODES: Dict[str, CacheMode] = {
+    "aisles": CacheMode.RESIDENT,
+    "departments": CacheMode.RESIDENT,
+    "products": CacheMode.LRU,
+}
+
+
+def parse_cache_modes(value: Optional[str]) -> Dict[str, CacheMode]:
+    """Parse a `collection=mode,...` string such as the DB_CACHE_MODES env variable."""
+    modes = dict(DEFAULT_CACHE_MODES)
+    if not value:
+        return modes
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, mode = item.partition("=")
+        modes[name.strip()] = CacheMode(mode.strip())
+    return modes
+
+
+class DocumentCache:
+    """Read-through cache of single documents by id, served according to a CacheMode.
+
+    none     - every lookup goes to MongoDB
+    lru      - the last `maxsize` documents looked up, each kept for `ttl` seconds
+    resident - the whole collection, reloaded every `ttl` seconds; ids that are not in it
+               are answered without a query
+
+    Writes made through the connector update the cache right away. Writes from other processes
+    are picked up when entries expire, or sooner with DB_CACHE_REVALIDATE (see
+    DBConnector._revalidate). The cached rows are shared, callers must not modify them.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, make_row: Callable[[dict], Any],
+                 mode: CacheMode = CacheMode.NONE, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        self.collection = collection
+        self.make_row = make_row
+        self.mode = CacheMode(mode)
+        self.ttl = ttl if ttl is not None else float(os.getenv("DB_CACHE_TTL", "300"))
+        maxsize = maxsize if maxsize is not None else int(os.getenv("DB_CACHE_SIZE", "10000"))
+        self.entries = LRUCache(maxsize, self.ttl)
+        self._resident: Optional[Dict[str, Any]] = None
+        self._loaded_at = 0.0
+        self._load_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def _load_resident(self) -> Dict[str, Any]:
+        async with self._load_lock:
+            if self._resident is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._resident = {str(document["_id"]): self.make_row(document)
+                                  async for document in self.collection.find()}
+                self._loaded_at = time.monotonic()
+                self.misses += 1
+            return self._resident
+
+    async def get(self, id: str) -> Any:
+        key = str(ObjectId(id))
+        if self.mode == CacheMode.RESIDENT:
+            if self._resident is not None and time.monotonic() - self._loaded_at <= self.ttl:
+                self.hits += 1
+                documents = self._resident
+            else:
+                documents = await self._load_resident()
+            return documents.get(key)
+        if self.mode == CacheMode.LRU:
+            row = self.entries.get(key)
+            if row is not None:
+                return row
+        document = await self.collection.find_one({"_id": ObjectId(key)})
+        if document is None:
+            return None
+        row = self.make_row(document)
+        if self.mode == CacheMode.LRU:
+            self.entries.put(key, row)
+        return row
+
+    def apply(self, operation: str, document: Optional[dict]):
+        """Bring the cache up to date after a local write; without the document everything is dropped."""
+        if document is None:
+            self.invalidate()
+            return
+        key = str(document["_id"])
+        if self.mode == CacheMode.RESIDENT and self._resident is not None:
+            if operation == "delete":
+                self._resident.pop(key, None)
+            else:
+                self._resident[key] = self.make_row(document)
+        elif self.mode == CacheMode.LRU:
+            if operation == "update":
+                self.entries.put(key, self.make_row(document))
+            else:
+                self.entries.discard(key)
+
+    def invalidate(self):
+        self._resident = None
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        if self.mode == CacheMode.LRU:
+            return {"mode": self.mode.value, **self.entries.stats()}
+        return {"mode": self.mode.value, "size": len(self._resident or {}), "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,47 @@
+from typing import Any, Dict, Tuple
+
+from pymongo import monitoring
+
+from src.main.metrics import MONGODB_COMMAND_FAILURES, MONGODB_COMMAND_SECONDS, MONGODB_DOCUMENTS_RETURNED
+
+# Commands whose first field is not the collection name
+COLLECTION_FIELD = {"getMore": "collection"}
+
+
+def returned_documents(command_name: str, reply: Dict[str, Any]) -> int:
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", ())))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") else 0
+    return 0
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Records the duration and the returned documents of every command, per collection.
+
+    The driver calls the listener from its own threads; a started event is matched with its
+    outcome through the connection and request id.
+    """
+
+    def __init__(self):
+        self._started: Dict[Tuple[Any, int], str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        field = COLLECTION_FIELD.get(event.command_name, event.command_name)
+        collection = event.command.get(field)
+        self._started[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        collection = self._started.pop((event.connection_id, event.request_id), "")
+        MONGODB_COMMAND_SECONDS.labels(collection=collection,
+                                       command=event.command_name).observe(event.duration_micros / 1e6)
+        documents = returned_documents(event.command_name, event.reply)
+        if documents:
+            MONGODB_DOCUMENTS_RETURNED.labels(collection=collection, command=event.command_name).inc(documents)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        collection = self._started.pop((event.connection_id, event.request_id), "")
+        MONGODB_COMMAND_SECONDS.labels(collection=collection,
+                                       command=event.command_name).observe(event.duration_micros / 1e6)
+        MONGODB_COMMAND_FAILURES.labels(collection=collection, command=event.command_name).inc()
@@ -0,0 +1,73 @@
+from dataclasses import dataclass
+from typing import Optional
+
+# Typed rows returned by the connector. They are slotted dataclasses, cheaper to build than dicts,
+# and orjson serializes them natively (NaN becomes null), so list pages skip jsonable_encoder.
+# Rows are shared with the document caches and must not be modified.
+
+
+@dataclass(slots=True)
+class OrderRow:
+    id: str
+    order_id: int
+    user_id: int
+    eval_set: str
+    order_number: int
+    order_dow: int
+    order_hour_of_day: int
+    days_since_prior_order: Optional[float]
+
+    @classmethod
+    def from_document(cls, order: dict) -> "OrderRow":
+        return cls(str(order["_id"]), order["order_id"], order["user_id"], order["eval_set"], order["order_number"],
+                   order["order_dow"], order["order_hour_of_day"], order.get("days_since_prior_order"))
+
+
+@dataclass(slots=True)
+class OrderProductRow:
+    id: str
+    order_id: int
+    product_id: int
+    add_to_cart_order: int
+    reordered: int
+
+    @classmethod
+    def from_document(cls, order_product: dict) -> "OrderProductRow":
+        return cls(str(order_product["_id"]), order_product["order_id"], order_product["product_id"],
+                   order_product["add_to_cart_order"], order_product["reordered"])
+
+
+@dataclass(slots=True)
+class AisleRow:
+    id: str
+    aisle_id: int
+    aisle: str
+
+    @classmethod
+    def from_document(cls, aisle: dict) -> "AisleRow":
+        return cls(str(aisle["_id"]), aisle["aisle_id"], aisle["aisle"])
+
+
+@dataclass(slots=True)
+class DepartmentRow:
+    id: str
+    department_id: int
+    department: str
+
+    @classmethod
+    def from_document(cls, department: dict) -> "DepartmentRow":
+        return cls(str(department["_id"]), department["department_id"], department["department"])
+
+
+@dataclass(slots=True)
+class ProductRow:
+    id: str
+    product_id: int
+    product_name: str
+    aisle_id: int
+    department_id: int
+
+    @classmethod
+    def from_document(cls, product: dict) -> "ProductRow":
+        return cls(str(product["_id"]), product["product_id"], product["product_name"], product["aisle_id"],
+                   product["department_id"])
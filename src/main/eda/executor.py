@@ -0,0 +1,89 @@
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+from src.main.eda.shared import map_frame, write_frame
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+# Frames a worker process has memory-mapped: frame name -> (file path, frame)
+_worker_frames: Dict[str, Tuple[str, pd.DataFrame]] = {}
+
+
+def _read_mapped(path: str) -> pd.DataFrame:
+    # Files are named <frame>-<uuid>.arrow, see AnalysisExecutor._export
+    name = Path(path).name.rsplit("-", 1)[0]
+    mapped = _worker_frames.get(name)
+    if mapped is None or mapped[0] != path:
+        # Arrow IPC files are memory-mapped, so numeric columns are read from the page cache without copies.
+        # Only the previous version of the same frame is dropped, it is never asked for again.
+        mapped = _worker_frames[name] = (path, map_frame(path))
+    return mapped[1]
+
+
+def _run_in_worker(function: Callable[..., Dict[str, Any]], paths: Dict[str, str]) -> Dict[str, Any]:
+    return function(**{name: _read_mapped(path) for name, path in paths.items()})
+
+
+class AnalysisExecutor:
+    """Runs the pure hypothesis functions away from the event loop.
+
+    inline  - on the event loop (no isolation, lowest overhead)
+    thread  - in a thread pool; frames are shared by reference
+    process - in a process pool; every frame version is written once as an Arrow file that
+              workers memory-map, so DataFrames are never pickled per call
+    """
+
+    def __init__(self, mode: Optional[str] = None, workers: Optional[int] = None):
+        self.mode = mode or os.getenv("ANALYSIS_EXECUTOR", "thread")
+        if self.mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown analysis executor {self.mode}")
+        workers = workers or int(os.getenv("ANALYSIS_WORKERS", "0")) or None
+        self._pool: Optional[Executor] = None
+        if self.mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+        elif self.mode == "process":
+            # spawn keeps the Motor client threads of this process out of the workers
+            self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            self._shared_dir = Path(tempfile.mkdtemp(prefix="analysis-frames-"))
+            self._exported: Dict[str, Tuple[Hashable, str]] = {}
+            self._export_lock = asyncio.Lock()
+
+    async def _export(self, name: str, version: Hashable, frame: pd.DataFrame) -> str:
+        async with self._export_lock:
+            exported = self._exported.get(name)
+            if exported and exported[0] == version:
+                return exported[1]
+            path = str(self._shared_dir / f"{name}-{uuid.uuid4().hex}.arrow")
+            await asyncio.to_thread(write_frame, frame, path)
+            if exported:
+                Path(exported[1]).unlink(missing_ok=True)
+            self._exported[name] = (version, path)
+            return path
+
+    async def run(self, function: Callable[..., Dict[str, Any]],
+                  frames: Dict[str, Tuple[Hashable, pd.DataFrame]]) -> Dict[str, Any]:
+        """Call `function` with keyword DataFrames given as {argument: (version, frame)}."""
+        if self.mode == "inline":
+            return function(**{name: frame for name, (_, frame) in frames.items()})
+        loop = asyncio.get_running_loop()
+        if self.mode == "thread":
+            return await loop.run_in_executor(
+                self._pool, lambda: function(**{name: frame for name, (_, frame) in frames.items()})
+            )
+        paths = {name: await self._export(name, version, frame) for name, (version, frame) in frames.items()}
+        return await loop.run_in_executor(self._pool, _run_in_worker, function, paths)
+
+    def shutdown(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        if self.mode == "process":
+            shutil.rmtree(self._shared_dir, ignore_errors=True)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+# Ids up to this many times the row count get a dense array lookup, sparser ids fall back to a hash index
+DENSE_LOOKUP_FACTOR = 8
+
+
+def lookup_positions(keys: pd.Series, ids: pd.Series) -> np.ndarray:
+    """Row position in `ids` of every value of `keys`, -1 where the value is absent.
+
+    Dense integer ids (the Instacart case) are resolved through a flat position array indexed
+    by id; duplicated ids resolve to their last row.
+    """
+    keys = keys.to_numpy()
+    ids = ids.to_numpy()
+    if len(ids) == 0:
+        return np.full(len(keys), -1, dtype=np.int64)
+    smallest, largest = int(ids.min()), int(ids.max())
+    if smallest >= 0 and largest <= DENSE_LOOKUP_FACTOR * len(ids) + 1024:
+        table = np.full(largest + 1, -1, dtype=np.int64)
+        table[ids] = np.arange(len(ids))
+        positions = np.full(len(keys), -1, dtype=np.int64)
+        inside = (keys >= 0) & (keys <= largest)
+        positions[inside] = table[keys[inside]]
+        return positions
+    last = ~pd.Index(ids).duplicated(keep="last")
+    # get_indexer answers positions among the unique ids, mapped back to rows of `ids` here
+    indexer = pd.Index(ids[last]).get_indexer(keys)
+    return np.where(indexer >= 0, np.flatnonzero(last)[indexer], -1).astype(np.int64)
+
+
+def _take(values: np.ndarray, positions: np.ndarray, missing: int, dtype: str) -> np.ndarray:
+    found = positions >= 0
+    result = np.full(len(positions), missing, dtype=dtype)
+    result[found] = values[positions[found]]
+    return result
+
+
+def build_fact_table(order_products_df: pd.DataFrame, products_df: pd.DataFrame, aisles_df: pd.DataFrame,
+                     departments_df: pd.DataFrame, orders_df: pd.DataFrame) -> pd.DataFrame:
+    """One row per order line with its product, aisle, department and order attributes attached.
+
+    Missing references are kept as -1 and flagged by the in_* columns, so filtering on a flag
+    gives the same rows as the inner merge with that table.
+    """
+    product_positions = lookup_positions(order_products_df["product_id"], products_df["product_id"])
+    aisle_id = _take(products_df["aisle_id"].to_numpy(), product_positions, -1, "int32")
+    department_id = _take(products_df["department_id"].to_numpy(), product_positions, -1, "int32")
+
+    aisle_positions = lookup_positions(pd.Series(aisle_id), aisles_df["aisle_id"])
+    aisle_codes = pd.factorize(aisles_df["aisle"], use_na_sentinel=False)[0]
+    department_positions = lookup_positions(pd.Series(department_id), departments_df["department_id"])
+    order_positions = lookup_positions(order_products_df["order_id"], orders_df["order_id"])
+
+    in_products = product_positions >= 0
+    return pd.DataFrame({
+        "order_id": order_products_df["order_id"].to_numpy(),
+        "product_id": order_products_df["product_id"].to_numpy(),
+        "reordered": order_products_df["reordered"].to_numpy(),
+        "aisle_id": aisle_id.astype("int16"),
+        "aisle_code": _take(aisle_codes, aisle_positions, -1, "int16"),
+        "department_id": department_id.astype("int16"),
+        "order_dow": _take(orders_df["order_dow"].to_numpy(), order_positions, -1, "int8"),
+        "order_hour_of_day": _take(orders_df["order_hour_of_day"].to_numpy(), order_positions, -1, "int8"),
+        "in_products": in_products,
+        "in_aisles": in_products & (aisle_positions >= 0),
+        "in_departments": in_products & (department_positions >= 0),
+        "in_orders": order_positions >= 0,
+    })
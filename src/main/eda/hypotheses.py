@@ -0,0 +1,88 @@
+from typing import Any, Dict
+
+import pandas as pd
+
+# Pure computations behind DataAnalysis.analyze_hypothesis*. They only take DataFrames, so they
+# can run inline, in a thread or in a worker process that memory-maps its inputs.
+
+
+def hypothesis1(fact_table: pd.DataFrame) -> Dict[str, Any]:
+    lines = fact_table.loc[fact_table['in_aisles'] & fact_table['in_departments'], ['order_id', 'aisle_code']]
+
+    aisles_per_order = lines.groupby('order_id', sort=False)['aisle_code'].nunique()
+
+    # Calculate the frequency of orders where products from the same aisle appear together
+    total_orders = len(aisles_per_order)
+    same_aisle_orders = int((aisles_per_order == 1).sum())
+
+    percentage_same_aisle = (same_aisle_orders / total_orders) * 100
+
+    return {
+        "total_orders": total_orders,
+        "same_aisle_orders": same_aisle_orders,
+        "percentage_same_aisle": percentage_same_aisle,
+    }
+
+
+def hypothesis2(order_products_df: pd.DataFrame) -> Dict[str, Any]:
+    total_products = order_products_df.shape[0]
+    reordered_products = int((order_products_df['reordered'] == 1).sum())
+
+    percentage_reordered = (reordered_products / total_products) * 100
+
+    return {
+        "total_products": total_products,
+        "reordered_products": reordered_products,
+        "percentage_reordered": percentage_reordered,
+    }
+
+
+def hypothesis3(products_df: pd.DataFrame, fact_table: pd.DataFrame) -> Dict[str, Any]:
+    # aisles_id IDs for fruits, eggs, bread
+    aisles_id = [24, 36, 94]
+
+    # Get product IDs for basic products
+    basic_products = products_df.loc[products_df['aisle_id'].isin(aisles_id), 'aisle_id'].unique()
+
+    hours = fact_table.loc[fact_table['product_id'].isin(basic_products) & fact_table['in_orders'],
+                           'order_hour_of_day']
+
+    # Categorize orders by time of day
+    morning_count = int(((hours >= 5) & (hours < 12)).sum())
+    evening_count = int(((hours >= 17) & (hours <= 23)).sum())
+
+    return {
+        "morning_count": morning_count,
+        "evening_count": evening_count,
+    }
+
+
+def hypothesis4(fact_table: pd.DataFrame) -> Dict[str, Any]:
+    lines = fact_table.loc[fact_table['in_departments'], ['order_id', 'product_id', 'department_id']]
+
+    order_stats = lines.groupby('order_id', sort=False).agg(
+        total_products=('product_id', 'count'),
+        unique_departments=('department_id', 'nunique')
+    )
+
+    correlation = order_stats['total_products'].corr(order_stats['unique_departments'])
+
+    return {
+        "average_departments": order_stats['unique_departments'].mean(),
+        "correlation": correlation,
+    }
+
+
+def hypothesis5(fact_table: pd.DataFrame) -> Dict[str, Any]:
+    lines = fact_table.loc[fact_table['in_orders'], ['order_id', 'order_dow']]
+    is_weekend = lines['order_dow'].isin([0, 1]).rename('is_weekend')
+
+    order_counts = lines.groupby([lines['order_id'], is_weekend], sort=False).size().reset_index(name='product_count')
+
+    avg_weekend = order_counts.loc[order_counts['is_weekend'], 'product_count'].mean()
+    avg_weekday = order_counts.loc[~order_counts['is_weekend'], 'product_count'].mean()
+
+    return {
+        "avg_weekend": avg_weekend,
+        "avg_weekday": avg_weekday,
+    }
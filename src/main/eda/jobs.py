@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from src.main.cache import LRUCache
+from src.main.eda.utils import FRAME_COLLECTIONS, DataAnalysis
+
+JOB_STATES = ("queued", "loading", "computing", "done", "failed")
+FINAL_STATES = ("done", "failed")
+# A running job refreshes its updated_at this often; one not refreshed for JOB_TIMEOUT seconds lost its worker
+JOB_HEARTBEAT_INTERVAL = 5.0
+JOB_TIMEOUT = 60.0
+# Seconds between two reads of a job running in another worker by wait()
+WAIT_POLL_INTERVAL = 0.5
+
+
+class AnalysisJobs:
+    """Background runs of the analyze_hypothesis* methods, shared by everyone asking for the same result.
+
+    A job is identified by its hypothesis and the versions of the collections it reads, so a second
+    request for unchanged data joins the existing job. Jobs are stored in MongoDB from the moment they
+    are submitted, which lets every worker of the app find a job started by another one and keeps a
+    second copy from starting; only the last ANALYSIS_JOBS_SIZE finished ones are kept in memory.
+    """
+
+    def __init__(self, analysis: DataAnalysis, maxsize: Optional[int] = None):
+        self.analysis = analysis
+        maxsize = maxsize if maxsize is not None else int(os.getenv("ANALYSIS_JOBS_SIZE", "256"))
+        # Queued and running jobs of this worker by id, and their ids by key
+        self.running: Dict[str, Dict[str, Any]] = {}
+        self._running_keys: Dict[str, str] = {}
+        # Finished and failed jobs by id, and the ids of the done ones by key
+        self.finished = LRUCache(maxsize)
+        self._finished_keys = LRUCache(maxsize)
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _method(self, hypothesis: int):
+        return getattr(self.analysis, f"analyze_hypothesis{hypothesis}")
+
+    async def _key(self, hypothesis: int) -> str:
+        versions = await self.analysis.db_connector.get_collection_versions()
+        frames = self._method(hypothesis).depends_on
+        return f"{hypothesis}:" + ",".join(f"{FRAME_COLLECTIONS[name]}={versions[FRAME_COLLECTIONS[name]]}"
+                                           for name in frames)
+
+    async def submit(self, hypothesis: int) -> Dict[str, Any]:
+        key = await self._key(hypothesis)
+        job = self._find(self._running_keys.get(key)) or self._find(self._finished_keys.get(key))
+        if job is not None:
+            return self.describe(job)
+        db = self.analysis.db_connector
+        while True:
+            stored = await self._abandon_if_stale(await db.find_analysis_job({"active_key": key}))
+            if stored is not None and stored["state"] != "failed":
+                if stored["state"] == "done":
+                    self._finish(stored)
+                return self.describe(stored)
+            now = time.time()
+            job = {
+                "id": uuid.uuid4().hex,
+                "hypothesis": hypothesis,
+                "key": key,
+                "state": "queued",
+                "result": None,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+                "finished_at": None,
+                "seconds": None,
+            }
+            try:
+                await db.insert_analysis_job(job, active_key=key)
+                break
+            except DuplicateKeyError:
+                # Another worker submitted the same job first: join it
+                continue
+            except Exception as e:
+                logging.warning(f"Could not store analysis job {job['id']}, running it unshared: {str(e)}")
+                break
+        self.running[job["id"]] = job
+        self._running_keys[key] = job["id"]
+        self._tasks[job["id"]] = asyncio.ensure_future(self._run(job))
+        return self.describe(job)
+
+    async def _store(self, job: Dict[str, Any], *fields: str, release: bool = False):
+        # The job keeps running when MongoDB is unavailable; other workers just see its last stored state
+        try:
+            await self.analysis.db_connector.update_analysis_job(
+                job["id"], {field: job[field] for field in ("updated_at", *fields)}, release=release
+            )
+        except Exception as e:
+            logging.warning(f"Could not store analysis job {job['id']}: {str(e)}")
+
+    async def _set_state(self, job: Dict[str, Any], state: str):
+        job["state"] = state
+        job["updated_at"] = time.time()
+        await self._store(job, "state")
+
+    async def _beat(self, job: Dict[str, Any]):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+            job["updated_at"] = time.time()
+            await self._store(job)
+
+    async def _run(self, job: Dict[str, Any]):
+        method = self._method(job["hypothesis"])
+        started = time.perf_counter()
+        heartbeat = asyncio.ensure_future(self._beat(job))
+        try:
+            if self.analysis.backends.get(method.__name__) != "mongo":
+                await self._set_state(job, "loading")
+                await self.analysis.load_dataframes(*method.depends_on)
+            await self._set_state(job, "computing")
+            job["result"] = await method()
+            job["state"] = "done"
+        except Exception as e:
+            logging.error(f"Analysis job {job['id']} failed: {str(e)}")
+            job["error"] = str(e)
+            job["state"] = "failed"
+        finally:
+            heartbeat.cancel()
+            job["finished_at"] = job["updated_at"] = time.time()
+            job["seconds"] = time.perf_counter() - started
+            self._tasks.pop(job["id"], None)
+            self.running.pop(job["id"], None)
+            self._running_keys.pop(job["key"], None)
+            self._finish(job)
+        # A failed job frees its key, so the next submit tries again
+        await self._store(job, "state", "result", "error", "finished_at", "seconds", release=job["state"] == "failed")
+
+    async def _abandon_if_stale(self, job: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Mark a job whose worker stopped refreshing it as failed, so it no longer holds its key."""
+        if job is None or job["state"] in FINAL_STATES or job["id"] in self.running \
+                or time.time() - job["updated_at"] < JOB_TIMEOUT:
+            return job
+        abandoned = {"state": "failed", "error": "The worker running this job stopped", "finished_at": time.time()}
+        # Only if nobody refreshed or finished it since it was read
+        await self.analysis.db_connector.update_analysis_job(
+            job["id"], abandoned, expected={"state": job["state"], "updated_at": job["updated_at"]}, release=True
+        )
+        return await self.analysis.db_connector.find_analysis_job({"id": job["id"]})
+
+    def describe(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        description = dict(job)
+        # Only the worker running a job knows how far its load got
+        if job["state"] == "loading" and job["id"] in self.running:
+            method = self._method(job["hypothesis"])
+            description["progress"] = {name: self.analysis.load_status[name] for name in method.depends_on}
+        return description
+
+    def _find(self, job_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        if job_id is None:
+            return None
+        return self.running.get(job_id) or self.finished.get(job_id)
+
+    def _finish(self, job: Dict[str, Any]):
+        self.finished.put(job["id"], job)
+        if job["state"] == "done":
+            self._finished_keys.put(job["key"], job["id"])
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._find(job_id)
+        if job is None:
+            job = await self._abandon_if_stale(await self.analysis.db_connector.find_analysis_job({"id": job_id}))
+            if job is None:
+                return None
+            # Jobs of other workers are read again until they finish
+            if job["state"] in FINAL_STATES:
+                self._finish(job)
+        return self.describe(job)
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Wait up to `timeout` seconds for a job to finish and return its latest description."""
+        # Held here, as a finished job can be evicted before this returns
+        job = self._find(job_id)
+        task = self._tasks.get(job_id)
+        if task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return self.describe(job)
+        # Finished, or running in another worker
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            description = await self.get(job_id)
+            if description is None or description["state"] in FINAL_STATES:
+                return description
+            remaining = WAIT_POLL_INTERVAL if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return description
+            await asyncio.sleep(min(WAIT_POLL_INTERVAL, remaining))
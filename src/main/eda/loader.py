@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+import pandas as pd
+from dotenv import find_dotenv, load_dotenv
+
+from src.main.db.connector import DBConnector
+from src.main.eda.shared import HEARTBEAT_INTERVAL, SharedFrameStore
+from src.main.eda.utils import FRAME_COLLECTIONS, FRAME_LOADERS, DataAnalysis
+
+REFRESH_INTERVAL = float(os.getenv("ANALYSIS_REFRESH_INTERVAL", "5"))
+
+
+async def publish(analysis: DataAnalysis, store: SharedFrameStore, versions: Dict[str, int],
+                  published: Optional[Dict[str, int]], published_frames: Dict[str, pd.DataFrame]):
+    """Reload the frames whose collection version differs from `published` and publish a new generation.
+
+    `published_frames` holds the frames of the last generation; only frames that are not the same objects
+    any more are written, so the fact table is only written again when one of its inputs was reloaded.
+    """
+    if published is not None:
+        analysis.mark_stale(*(name for name, collection in FRAME_COLLECTIONS.items()
+                              if versions[collection] != published.get(collection)))
+    fact_table = await analysis.fact_table()
+    frames = {name: getattr(analysis, name) for name in FRAME_LOADERS}
+    frames["fact_table"] = fact_table
+    changed = {name: frame for name, frame in frames.items() if published_frames.get(name) is not frame}
+    generation = await asyncio.to_thread(store.publish, changed, versions)
+    published_frames.update(changed)
+    logging.info(f"Published analysis frames {generation} at versions {versions}, writing {sorted(changed)}")
+
+
+async def refresh_forever(analysis: DataAnalysis, store: SharedFrameStore, interval: float = REFRESH_INTERVAL):
+    published = None
+    published_frames: Dict[str, pd.DataFrame] = {}
+    while True:
+        try:
+            # Fills DBConnector.indexes, so the order lines are loaded through the covering index
+            if not analysis.db_connector.indexes and os.getenv("DB_ENSURE_INDEXES", "true").lower() == "true":
+                await analysis.db_connector.ensure_indexes()
+            # Read before the data, so a write racing the load is picked up by the next round
+            versions = await analysis.db_connector.get_collection_versions()
+            if versions != published:
+                await publish(analysis, store, versions, published, published_frames)
+                published = versions
+        except Exception as e:
+            # The workers keep serving the last generation; the next round tries again
+            logging.error(f"Could not refresh the shared analysis frames: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+async def beat_forever(store: SharedFrameStore):
+    # Runs beside refresh_forever, so a long load does not look like a dead loader to the workers
+    while True:
+        await asyncio.to_thread(store.beat)
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+
+def run_loader(directory: str):
+    """Entry point of the loader process started by src/main/serve.py: owns the shared frames in `directory`."""
+    load_dotenv(find_dotenv())
+    logging.basicConfig(level=logging.INFO)
+    # This process loads the frames itself; only the web workers map them from the store
+    os.environ.pop("ANALYSIS_SHARED_DIR", None)
+
+    async def run():
+        analysis = DataAnalysis(db_connector=DBConnector(conn_id=os.getenv("DB_CONN")))
+        store = SharedFrameStore(directory)
+        heartbeat = asyncio.ensure_future(beat_forever(store))
+        try:
+            await refresh_forever(analysis, store)
+        finally:
+            heartbeat.cancel()
+            analysis.executor.shutdown()
+            analysis.db_connector.close()
+
+    asyncio.run(run())
@@ -0,0 +1,144 @@
+import math
+from typing import Any, Awaitable, Callable, Dict, List
+
+from src.main.db.connector import DBConnector
+
+
+def _lookup(collection: str, field: str, alias: str) -> List[Dict[str, Any]]:
+    # $unwind drops lines without a match, which gives the inner-merge semantics of the pandas path
+    return [
+        {"$lookup": {"from": collection, "localField": field, "foreignField": field, "as": alias}},
+        {"$unwind": f"${alias}"},
+    ]
+
+
+def _nan_if_none(value: Any) -> float:
+    return math.nan if value is None else value
+
+
+async def hypothesis1(db: DBConnector) -> Dict[str, Any]:
+    pipeline = [
+        {"$project": {"_id": 0, "order_id": 1, "product_id": 1}},
+        *_lookup("products", "product_id", "product"),
+        {"$project": {"order_id": 1, "aisle_id": "$product.aisle_id", "department_id": "$product.department_id"}},
+        *_lookup("aisles", "aisle_id", "aisle"),
+        *_lookup("departments", "department_id", "department"),
+        {"$group": {"_id": "$order_id", "aisles": {"$addToSet": "$aisle.aisle"}}},
+        {"$group": {
+            "_id": None,
+            "total_orders": {"$sum": 1},
+            "same_aisle_orders": {"$sum": {"$cond": [{"$eq": [{"$size": "$aisles"}, 1]}, 1, 0]}},
+        }},
+    ]
+    rows = await db.aggregate("orders_train", pipeline)
+    total_orders = rows[0]["total_orders"] if rows else 0
+    same_aisle_orders = rows[0]["same_aisle_orders"] if rows else 0
+    return {
+        "total_orders": total_orders,
+        "same_aisle_orders": same_aisle_orders,
+        "percentage_same_aisle": (same_aisle_orders / total_orders) * 100,
+    }
+
+
+async def hypothesis2(db: DBConnector) -> Dict[str, Any]:
+    pipeline = [
+        {"$group": {
+            "_id": None,
+            "total_products": {"$sum": 1},
+            "reordered_products": {"$sum": {"$cond": [{"$eq": ["$reordered", 1]}, 1, 0]}},
+        }},
+    ]
+    rows = await db.aggregate("orders_train", pipeline)
+    total_products = rows[0]["total_products"] if rows else 0
+    reordered_products = rows[0]["reordered_products"] if rows else 0
+    return {
+        "total_products": total_products,
+        "reordered_products": reordered_products,
+        "percentage_reordered": (reordered_products / total_products) * 100,
+    }
+
+
+async def hypothesis3(db: DBConnector) -> Dict[str, Any]:
+    # Same selection as the pandas path: the basic aisle ids that occur in products
+    basic_products = await db.products_collection.distinct("aisle_id", {"aisle_id": {"$in": [24, 36, 94]}})
+    pipeline = [
+        {"$match": {"product_id": {"$in": basic_products}}},
+        {"$project": {"_id": 0, "order_id": 1}},
+        *_lookup("orders", "order_id", "order"),
+        {"$group": {
+            "_id": None,
+            "morning_count": {"$sum": {"$cond": [{"$and": [
+                {"$gte": ["$order.order_hour_of_day", 5]}, {"$lt": ["$order.order_hour_of_day", 12]}
+            ]}, 1, 0]}},
+            "evening_count": {"$sum": {"$cond": [{"$and": [
+                {"$gte": ["$order.order_hour_of_day", 17]}, {"$lte": ["$order.order_hour_of_day", 23]}
+            ]}, 1, 0]}},
+        }},
+    ]
+    rows = await db.aggregate("orders_train", pipeline)
+    return {
+        "morning_count": rows[0]["morning_count"] if rows else 0,
+        "evening_count": rows[0]["evening_count"] if rows else 0,
+    }
+
+
+async def hypothesis4(db: DBConnector) -> Dict[str, Any]:
+    pipeline = [
+        {"$project": {"_id": 0, "order_id": 1, "product_id": 1}},
+        *_lookup("products", "product_id", "product"),
+        {"$project": {"order_id": 1, "department_id": "$product.department_id"}},
+        *_lookup("departments", "department_id", "department"),
+        {"$group": {"_id": "$order_id", "x": {"$sum": 1}, "departments": {"$addToSet": "$department_id"}}},
+        {"$project": {"x": 1, "y": {"$size": "$departments"}}},
+        # Sums for the mean and the Pearson correlation, finished below
+        {"$group": {
+            "_id": None,
+            "n": {"$sum": 1},
+            "sx": {"$sum": "$x"},
+            "sy": {"$sum": "$y"},
+            "sxx": {"$sum": {"$multiply": ["$x", "$x"]}},
+            "syy": {"$sum": {"$multiply": ["$y", "$y"]}},
+            "sxy": {"$sum": {"$multiply": ["$x", "$y"]}},
+        }},
+    ]
+    rows = await db.aggregate("orders_train", pipeline)
+    if not rows:
+        return {"average_departments": math.nan, "correlation": math.nan}
+    n, sx, sy = rows[0]["n"], rows[0]["sx"], rows[0]["sy"]
+    covariance = n * rows[0]["sxy"] - sx * sy
+    variance_x = n * rows[0]["sxx"] - sx * sx
+    variance_y = n * rows[0]["syy"] - sy * sy
+    correlation = math.nan
+    if n > 1 and variance_x > 0 and variance_y > 0:
+        correlation = covariance / math.sqrt(variance_x * variance_y)
+    return {
+        "average_departments": sy / n,
+        "correlation": correlation,
+    }
+
+
+async def hypothesis5(db: DBConnector) -> Dict[str, Any]:
+    pipeline = [
+        {"$project": {"_id": 0, "order_id": 1}},
+        *_lookup("orders", "order_id", "order"),
+        {"$group": {
+            "_id": {"order_id": "$order_id", "is_weekend": {"$in": ["$order.order_dow", [0, 1]]}},
+            "product_count": {"$sum": 1},
+        }},
+        {"$group": {"_id": "$_id.is_weekend", "average": {"$avg": "$product_count"}}},
+    ]
+    averages = {row["_id"]: row["average"] for row in await db.aggregate("orders_train", pipeline)}
+    return {
+        "avg_weekend": _nan_if_none(averages.get(True)),
+        "avg_weekday": _nan_if_none(averages.get(False)),
+    }
+
+
+# analyze_hypothesis* method name -> server-side implementation
+PIPELINES: Dict[str, Callable[[DBConnector], Awaitable[Dict[str, Any]]]] = {
+    "analyze_hypothesis1": hypothesis1,
+    "analyze_hypothesis2": hypothesis2,
+    "analyze_hypothesis3": hypothesis3,
+    "analyze_hypothesis4": hypothesis4,
+    "analyze_hypothesis5": hypothesis5,
+}
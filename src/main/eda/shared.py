@@ -0,0 +1,108 @@
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+MANIFEST = "manifest.json"
+# Touched by the loader every HEARTBEAT_INTERVAL seconds while it runs, even during long loads
+HEARTBEAT = "heartbeat"
+HEARTBEAT_INTERVAL = 1.0
+# Times read() follows a manifest replaced while it opened the files
+READ_ATTEMPTS = 3
+
+
+def write_frame(frame: pd.DataFrame, path: str):
+    feather.write_feather(frame, path, compression="uncompressed")
+
+
+def map_frame(path: str) -> pd.DataFrame:
+    """Open an Arrow IPC file written by write_frame as a DataFrame backed by the memory-mapped file.
+
+    split_blocks keeps pandas from consolidating the columns into new arrays, so numeric columns
+    without missing values stay views of the page cache, shared by every process mapping the file.
+    """
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+
+
+class SharedFrameStore:
+    """Analysis DataFrames published as Arrow files by one loader process and mapped read-only by the
+    web workers (see src/main/serve.py).
+
+    A publication replaces the whole set of frames at once: the changed frames are written under new
+    names and then the manifest naming them, and the unchanged files of the previous generation, is
+    swapped in, so readers always see frames of a single generation. Files no longer named are deleted;
+    processes still mapping them keep their pages until they move on.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._manifest_mtime: Optional[int] = None
+        # Frames mapped by read(), by file name, so files kept across generations are not mapped again
+        self._mapped: Dict[str, pd.DataFrame] = {}
+
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        """The current manifest, or None before the first publication. Only re-read when it changed."""
+        path = self.directory / MANIFEST
+        try:
+            mtime = path.stat().st_mtime_ns
+            if mtime != self._manifest_mtime:
+                self._manifest = json.loads(path.read_text())
+                self._manifest_mtime = mtime
+        except FileNotFoundError:
+            self._manifest, self._manifest_mtime = None, None
+        return self._manifest
+
+    def beat(self):
+        (self.directory / HEARTBEAT).touch()
+
+    def heartbeat_age(self) -> Optional[float]:
+        """Seconds since the loader last called beat(), None if it never did."""
+        try:
+            return time.time() - (self.directory / HEARTBEAT).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def publish(self, frames: Dict[str, pd.DataFrame], versions: Dict[str, int]) -> str:
+        """Publish a new generation tagged with the collection `versions` it was loaded at.
+
+        Only the changed `frames` are written; every other frame keeps its file of the current generation.
+        """
+        generation = uuid.uuid4().hex
+        current = self.manifest()
+        files = dict(current["files"]) if current else {}
+        for name, frame in frames.items():
+            files[name] = f"{name}-{generation}.arrow"
+            write_frame(frame, str(self.directory / files[name]))
+        manifest = {"generation": generation, "published_at": time.time(), "versions": versions, "files": files}
+        tmp_path = self.directory / f"{MANIFEST}.tmp"
+        tmp_path.write_text(json.dumps(manifest))
+        os.replace(tmp_path, self.directory / MANIFEST)
+        for path in self.directory.glob("*.arrow"):
+            if path.name not in files.values():
+                path.unlink(missing_ok=True)
+        return generation
+
+    def read(self) -> Tuple[Optional[Dict[str, Any]], Dict[str, pd.DataFrame]]:
+        """The current manifest and every frame of it, mapped; (None, {}) before the first publication."""
+        for _ in range(READ_ATTEMPTS):
+            manifest = self.manifest()
+            if manifest is None:
+                return None, {}
+            try:
+                mapped = {file: self._mapped[file] if file in self._mapped else map_frame(str(self.directory / file))
+                          for file in manifest["files"].values()}
+                self._mapped = mapped
+                return manifest, {name: mapped[file] for name, file in manifest["files"].items()}
+            except FileNotFoundError:
+                # A newer generation was published between reading the manifest and opening its files
+                self._manifest_mtime = None
+        raise FileNotFoundError(f"The shared frames in {self.directory} are missing")
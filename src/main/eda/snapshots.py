@@ -0,0 +1,51 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+
+class SnapshotStore:
+    """Parquet copies of the analysis DataFrames, each tagged with the collection version it was built from.
+
+    A snapshot is only returned while its version matches the current one, so any write made through
+    DBConnector (which bumps the version) makes the next load go back to MongoDB.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, name: str):
+        return self.directory / f"{name}.parquet", self.directory / f"{name}.json"
+
+    def load(self, name: str, version: int) -> Optional[pd.DataFrame]:
+        data_path, meta_path = self._paths(name)
+        try:
+            meta = json.loads(meta_path.read_text())
+            if meta.get("version") != version:
+                return None
+            return pd.read_parquet(data_path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable snapshot {name}: {str(e)}")
+            return None
+
+    def save(self, name: str, frame: pd.DataFrame, version: int):
+        data_path, meta_path = self._paths(name)
+        # Write to temporary files first so a crash never leaves a snapshot paired with the wrong version
+        tmp_data, tmp_meta = data_path.with_suffix(".parquet.tmp"), meta_path.with_suffix(".json.tmp")
+        frame.to_parquet(tmp_data, index=False)
+        tmp_meta.write_text(json.dumps({"version": version, "rows": len(frame)}))
+        meta_path.unlink(missing_ok=True)
+        os.replace(tmp_data, data_path)
+        os.replace(tmp_meta, meta_path)
+
+    def clear(self):
+        for path in self.directory.glob("*.parquet"):
+            path.unlink()
+        for path in self.directory.glob("*.json"):
+            path.unlink()
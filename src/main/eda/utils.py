@@ -1,128 +1,507 @@
-from typing import Dict, Any
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+import numpy as np
 import pandas as pd
-from src.main.db.connector import DBConnector
+from src.main.db.connector import DBConnector, DATAFRAME_BATCH_SIZE
+from src.main.db.events import ChangeEvent, subscribe
+from src.main.eda import hypotheses
+from src.main.eda.executor import AnalysisExecutor
+from src.main.eda.facts import build_fact_table
+from src.main.eda.pipelines import PIPELINES
+from src.main.eda.shared import SharedFrameStore
+from src.main.eda.snapshots import SnapshotStore
+from src.main.cache import LRUCache
+from src.main.metrics import ANALYSIS_FRAME_BYTES, ANALYSIS_STAGE_SECONDS
 import asyncio
+import functools
+import logging
+import os
+import sys
+import time
+
+# Schema of the analysis frames: only these columns are read from MongoDB, each with the narrowest dtype
+# the Instacart ids and counters fit in. Low-cardinality strings are categoricals, and product_name,
+# which no hypothesis reads, is not loaded at all.
+FRAME_DTYPES: Dict[str, Dict[str, str]] = {
+    "orders_df": {
+        "order_id": "int32",
+        "user_id": "int32",
+        "eval_set": "category",
+        "order_number": "int16",
+        "order_dow": "uint8",
+        "order_hour_of_day": "uint8",
+        "days_since_prior_order": "float32",
+    },
+    "order_products_df": {
+        "order_id": "int32",
+        "product_id": "int32",
+        "add_to_cart_order": "int16",
+        "reordered": "int8",
+    },
+    "products_df": {
+        "product_id": "int32",
+        "aisle_id": "int16",
+        "department_id": "int8",
+    },
+    "aisles_df": {
+        "aisle_id": "int16",
+        "aisle": "category",
+    },
+    "departments_df": {
+        "department_id": "int8",
+        "department": "category",
+    },
+}
+
+
+def coerce_dtypes(frame: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    for column, dtype in dtypes.items():
+        if column in frame.columns:
+            frame[column] = frame[column].astype(dtype)
+    return frame
+
+
+def unnarrowed_bytes(series: pd.Series) -> int:
+    """Bytes `series` would take as built by pd.DataFrame(documents): int64/float64, or Python objects."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # One pointer per row plus the string it points at; equal strings are not shared after decoding BSON
+        sizes = np.array([sys.getsizeof(value) for value in series.cat.categories] + [0], dtype=np.int64)
+        return int(sizes[series.cat.codes.to_numpy()].sum()) + 8 * len(series)
+    if series.dtype == object:
+        return int(series.memory_usage(index=False, deep=True))
+    return len(series) if series.dtype == bool else 8 * len(series)
+
+
+def frame_memory(frame: pd.DataFrame) -> Dict[str, Any]:
+    """Memory used by each column of `frame`, and what the same columns would use without FRAME_DTYPES."""
+    columns = {
+        column: {"dtype": str(frame[column].dtype), "bytes": int(frame[column].memory_usage(index=False, deep=True))}
+        for column in frame.columns
+    }
+    used = sum(column["bytes"] for column in columns.values())
+    unnarrowed = sum(unnarrowed_bytes(frame[column]) for column in frame.columns)
+    return {
+        "rows": len(frame),
+        "bytes": used,
+        "unnarrowed_bytes": unnarrowed,
+        "reduction": round(unnarrowed / used, 2) if used else None,
+        "columns": columns,
+    }
+
+
+def _chunk_from_columns(columns: Dict[str, List[Any]], dtypes: Dict[str, str]) -> pd.DataFrame:
+    return coerce_dtypes(pd.DataFrame(columns), dtypes)
+
+
+def _frame_from_chunks(chunks: List[pd.DataFrame], dtypes: Dict[str, str]) -> pd.DataFrame:
+    if not chunks:
+        return coerce_dtypes(pd.DataFrame(columns=list(dtypes)), dtypes)
+    return coerce_dtypes(pd.concat(chunks, ignore_index=True), dtypes)
+
+
+async def frame_from_batches(batches: AsyncIterator[Dict[str, List[Any]]], dtypes: Dict[str, str],
+                             on_batch: Optional[Callable[[int], None]] = None) -> pd.DataFrame:
+    """Build a DataFrame from streamed column batches, narrowing each chunk as it arrives.
+
+    The chunks are built and concatenated in a thread, so requests keep being served during a load.
+    """
+    # Categories differ between chunks, so they are only applied once after the concat
+    chunk_dtypes = {column: dtype for column, dtype in dtypes.items() if dtype != "category"}
+    chunks = []
+    async for columns in batches:
+        chunk = await asyncio.to_thread(_chunk_from_columns, columns, chunk_dtypes)
+        chunks.append(chunk)
+        if on_batch:
+            on_batch(len(chunk))
+    return await asyncio.to_thread(_frame_from_chunks, chunks, dtypes)
+
+
+# DataAnalysis attribute -> DBConnector method streaming its collection
+FRAME_LOADERS: Dict[str, str] = {
+    "orders_df": "iter_orders_batches",
+    "order_products_df": "iter_order_products_batches",
+    "products_df": "iter_products_batches",
+    "aisles_df": "iter_aisles_batches",
+    "departments_df": "iter_departments_batches",
+}
+
+# DataAnalysis attribute -> collection it is loaded from
+FRAME_COLLECTIONS: Dict[str, str] = {
+    "orders_df": "orders",
+    "order_products_df": "orders_train",
+    "products_df": "products",
+    "aisles_df": "aisles",
+    "departments_df": "departments",
+}
+
+# With ANALYSIS_SHARED_DIR: seconds between checks for frames published by the loader, the longest wait
+# for them, and the heartbeat age after which the loader counts as dead
+SHARED_POLL_INTERVAL = 0.5
+SHARED_TIMEOUT = float(os.getenv("ANALYSIS_SHARED_TIMEOUT", "300"))
+LOADER_HEARTBEAT_TIMEOUT = 30
+
+# Column identifying a row, for the frames that can take single-document changes in place
+FRAME_KEYS: Dict[str, str] = {
+    "orders_df": "order_id",
+    "products_df": "product_id",
+    "aisles_df": "aisle_id",
+    "departments_df": "department_id",
+}
+
+
+def apply_document_changes(frame: pd.DataFrame, key: str, changes: List[ChangeEvent]) -> pd.DataFrame:
+    """Return `frame` with the rows of `changes` inserted, replaced or removed, keeping its dtypes.
+
+    Only the last change of each document counts, and the frame is filtered and concatenated once
+    for the whole batch.
+    """
+    latest = {change.document[key]: change for change in changes}
+    remaining = frame[~frame[key].isin(list(latest))]
+    rows = [{column: change.document.get(column) for column in frame.columns}
+            for change in latest.values() if change.operation != "delete"]
+    if not rows:
+        return remaining.reset_index(drop=True)
+    for column in frame.columns:
+        if not isinstance(frame[column].dtype, pd.CategoricalDtype):
+            continue
+        added = {row[column] for row in rows if row[column] is not None} - set(frame[column].cat.categories)
+        if added:
+            remaining = remaining.assign(**{column: remaining[column].cat.add_categories(sorted(added))})
+    new_rows = pd.DataFrame(rows).astype(remaining.dtypes.to_dict())
+    return pd.concat([remaining, new_rows], ignore_index=True)
+
+
+def parse_backends(value: Optional[str]) -> Dict[str, str]:
+    """Parse a `hypothesis=backend,...` string such as ANALYSIS_BACKENDS, e.g. `2=mongo,4=mongo`."""
+    backends = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        number, _, backend = item.partition("=")
+        backend = backend.strip()
+        if backend not in ("pandas", "mongo"):
+            raise ValueError(f"Unknown analysis backend {backend}")
+        backends[f"analyze_hypothesis{number.strip()}"] = backend
+    return backends
+
+
+def cached_analysis(*frames: str):
+    """Memoize an analyze_hypothesis* method on the versions of the frames it reads.
+
+    Only `frames` are loaded before the call, and a cached result is reused until one of
+    them changes or the entry is evicted from the result cache. Hypotheses switched to the
+    mongo backend run their aggregation pipeline instead and are keyed on collection versions.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self) -> Dict[str, Any]:
+            analysis = method.__name__.replace("analyze_", "")
+            if self.backends.get(method.__name__) == "mongo":
+                versions = await self.db_connector.get_collection_versions()
+                key = (method.__name__, "mongo", tuple(versions[FRAME_COLLECTIONS[name]] for name in frames))
+                result = self.result_cache.get(key)
+                if result is None:
+                    with ANALYSIS_STAGE_SECONDS.labels(analysis=analysis, stage="aggregate").time():
+                        result = await PIPELINES[method.__name__](self.db_connector)
+                    self.result_cache.put(key, result)
+                return result
+            with ANALYSIS_STAGE_SECONDS.labels(analysis=analysis, stage="load").time():
+                await self.load_dataframes(*frames)
+            key = (method.__name__, tuple(self.frame_versions[name] for name in frames))
+            result = self.result_cache.get(key)
+            if result is None:
+                result = await method(self)
+                self.result_cache.put(key, result)
+            return result
+
+        wrapper.depends_on = frames
+        return wrapper
+
+    return decorator
+
 
 class DataAnalysis:
-    def __init__(self, conn_id: str):
-        self.db_connector = DBConnector(conn_id)
+    def __init__(self, conn_id: Optional[str] = None, batch_size: int = DATAFRAME_BATCH_SIZE,
+                 snapshot_dir: Optional[str] = None, backends: Optional[Dict[str, str]] = None,
+                 db_connector: Optional[DBConnector] = None, shared_dir: Optional[str] = None):
+        # The web app passes its shared connector; standalone use opens one from conn_id
+        self.db_connector = db_connector or DBConnector(conn_id)
+        self.batch_size = batch_size
+        # analyze_hypothesis* name -> "pandas" (default) or "mongo"
+        self.backends = backends if backends is not None else parse_backends(os.getenv("ANALYSIS_BACKENDS"))
+        snapshot_dir = snapshot_dir or os.getenv("ANALYSIS_SNAPSHOT_DIR")
+        self.snapshots = SnapshotStore(snapshot_dir) if snapshot_dir else None
+        # Under src/main/serve.py the frames are loaded by a separate process and only mapped here
+        shared_dir = shared_dir or os.getenv("ANALYSIS_SHARED_DIR")
+        self.shared = SharedFrameStore(shared_dir) if shared_dir else None
+        self._shared_generation: Optional[str] = None
+        # Collection versions of the attached generation
+        self._shared_versions: Dict[str, int] = {}
+        self._shared_lock = asyncio.Lock()
         # DataFrames will be initialized as None
         self.orders_df = None
         self.order_products_df = None
         self.products_df = None
         self.aisles_df = None
         self.departments_df = None
+        # Shared by every caller that arrives while a load is running
+        self._load_task: Optional[asyncio.Task] = None
+        self.load_status: Dict[str, Dict[str, Any]] = {
+            name: {"state": "pending", "source": None, "rows": 0, "seconds": None} for name in FRAME_LOADERS
+        }
+        # Loaded frames that missed a change and must be read again on the next load_dataframes
+        self._stale: Set[str] = set()
+        # Writes not yet applied to the loaded frames, see apply_change
+        self._pending: Dict[str, List[ChangeEvent]] = {name: [] for name in FRAME_LOADERS}
+        self._pending_lock = asyncio.Lock()
+        # Bumped whenever a frame is replaced or patched; cached results are keyed on these
+        self.frame_versions: Dict[str, int] = {name: 0 for name in FRAME_LOADERS}
+        # Order lines joined with every dimension, rebuilt when any frame version changes
+        self._fact_table: Optional[pd.DataFrame] = None
+        self._fact_versions: Optional[tuple] = None
+        self._fact_lock = asyncio.Lock()
+        # CPU-heavy pandas work runs here instead of on the event loop
+        self.executor = AnalysisExecutor()
+        self.result_cache = LRUCache(maxsize=int(os.getenv("ANALYSIS_CACHE_SIZE", "64")),
+                                     ttl=float(os.getenv("ANALYSIS_CACHE_TTL", "3600")))
+        subscribe(self.apply_change)
 
-    async def load_dataframes(self):
-        if self.orders_df is None:
-            orders = await self.db_connector.get_orders_dataframe()
-            self.orders_df = pd.DataFrame(orders)
-        if self.order_products_df is None:
-            order_products = await self.db_connector.get_order_products_dataframe()
-            self.order_products_df = pd.DataFrame(order_products)
-        if self.products_df is None:
-            products = await self.db_connector.get_products_dataframe()
-            self.products_df = pd.DataFrame(products)
-        if self.aisles_df is None:
-            aisles = await self.db_connector.get_aisles_dataframe()
-            self.aisles_df = pd.DataFrame(aisles)
-        if self.departments_df is None:
-            departments = await self.db_connector.get_departments_dataframe()
-            self.departments_df = pd.DataFrame(departments)
-
-    async def analyze_hypothesis1(self) -> Dict[str, Any]:
-        await self.load_dataframes()
+    def _set_frame(self, name: str, frame: pd.DataFrame):
+        setattr(self, name, frame)
+        self.frame_versions[name] += 1
+        ANALYSIS_FRAME_BYTES.labels(frame=name).set(int(frame.memory_usage(index=True, deep=True).sum()))
+        # Results computed from the previous frame can never be hit again
+        self.result_cache.discard_where(
+            lambda key: name in getattr(getattr(self, key[0]), "depends_on", ())
+        )
 
-        merged_df = self.order_products_df.merge(self.products_df, on="product_id")
-        merged_df = merged_df.merge(self.aisles_df, on="aisle_id")
-        merged_df = merged_df.merge(self.departments_df, on="department_id")
+    def apply_change(self, event: ChangeEvent):
+        """Keep the loaded frames in step with writes made through any DBConnector of this process.
 
-        order_aisles = merged_df.groupby('order_id')['aisle'].apply(set).reset_index()
+        This runs inside the write request, so it only queues the change; the queued changes are
+        applied in one batch, off the event loop, by the next load_dataframes.
+        """
+        if self.shared:
+            # Patching would copy the mapped frames into this process; the loader picks the write up instead
+            return
+        for name, collection in FRAME_COLLECTIONS.items():
+            if collection != event.collection:
+                continue
+            loading = self.load_status[name]["state"] == "loading"
+            if FRAME_KEYS.get(name) is None or event.document is None:
+                # Bulk writes and frames without a row key can only be picked up by reading the frame again
+                self._stale.add(name)
+                self._pending[name].clear()
+            elif name not in self._stale and (loading or getattr(self, name) is not None):
+                # A load running now may or may not read this write; applying it afterwards is harmless,
+                # as only the last change of each document counts
+                self._pending[name].append(event)
 
-        # Calculate the frequency of orders where products from the same aisle appear together
-        total_orders = order_aisles.shape[0]
-        same_aisle_orders = order_aisles[order_aisles['aisle'].apply(lambda x: len(x) == 1)].shape[0]
+    async def _apply_pending(self):
+        async with self._pending_lock:
+            for name, changes in self._pending.items():
+                # Changes made during a load wait for it to finish
+                if not changes or self.load_status[name]["state"] == "loading":
+                    continue
+                self._pending[name] = []
+                if name in self._stale:
+                    continue
+                frame = getattr(self, name)
+                try:
+                    patched = await asyncio.to_thread(apply_document_changes, frame, FRAME_KEYS[name], changes)
+                except (KeyError, ValueError, TypeError) as e:
+                    logging.warning(f"Reloading {name} after failing to apply {len(changes)} changes: {str(e)}")
+                    self._stale.add(name)
+                    continue
+                # A load that finished meanwhile already read these writes
+                if getattr(self, name) is frame:
+                    self._set_frame(name, patched)
 
-        percentage_same_aisle = (same_aisle_orders / total_orders) * 100
+    async def _load_frame(self, name: str, version: int):
+        self._stale.discard(name)
+        # The load reads every write made so far
+        self._pending[name] = []
+        status = self.load_status[name]
+        status.update(state="loading", source=None, rows=0, seconds=None)
+        started = time.perf_counter()
 
-        return {
-            "total_orders": total_orders,
-            "same_aisle_orders": same_aisle_orders,
-            "percentage_same_aisle": percentage_same_aisle,
-        }
+        def on_batch(rows: int):
+            status["rows"] += rows
 
-    async def analyze_hypothesis2(self) -> Dict[str, Any]:
-        await self.load_dataframes()
+        try:
+            frame = None
+            if self.snapshots:
+                frame = await asyncio.to_thread(self.snapshots.load, name, version)
+            if frame is not None and list(frame.columns) != list(FRAME_DTYPES[name]):
+                # Written before FRAME_DTYPES changed
+                frame = None
+            if frame is not None:
+                frame = coerce_dtypes(frame, FRAME_DTYPES[name])
+                status.update(source="snapshot", rows=len(frame))
+            else:
+                batches = getattr(self.db_connector, FRAME_LOADERS[name])(self.batch_size, list(FRAME_DTYPES[name]))
+                frame = await frame_from_batches(batches, FRAME_DTYPES[name], on_batch)
+                status["source"] = "database"
+                if self.snapshots:
+                    await self._save_snapshot(name, frame, version)
+        except Exception:
+            status["state"] = "failed"
+            raise
+        finally:
+            status["seconds"] = time.perf_counter() - started
+        self._set_frame(name, frame)
+        status["state"] = "loaded"
 
-        total_products = self.order_products_df.shape[0]
-        reordered_products = self.order_products_df[self.order_products_df['reordered'] == 1].shape[0]
+    async def _attach_shared(self, frames: Tuple[str, ...]):
+        """Map the frames published by the loader, once they include every write made so far to `frames`.
 
-        percentage_reordered = (reordered_products / total_products) * 100
+        Raises TimeoutError when the loader stopped beating or has not caught up within SHARED_TIMEOUT.
+        """
+        versions = await self.db_connector.get_collection_versions()
+        wanted = {FRAME_COLLECTIONS[name]: versions[FRAME_COLLECTIONS[name]] for name in frames}
+        started = time.perf_counter()
+        while True:
+            manifest = await asyncio.to_thread(self.shared.manifest)
+            if manifest and all(manifest["versions"].get(collection, 0) >= version
+                                for collection, version in wanted.items()):
+                break
+            heartbeat_age = await asyncio.to_thread(self.shared.heartbeat_age)
+            if heartbeat_age is not None and heartbeat_age > LOADER_HEARTBEAT_TIMEOUT:
+                self._shared_failed(frames)
+                raise TimeoutError(f"The analysis loader has not run for {heartbeat_age:.0f} s")
+            if time.perf_counter() - started > SHARED_TIMEOUT:
+                self._shared_failed(frames)
+                raise TimeoutError(f"The analysis loader published no frames with {wanted} "
+                                   f"within {SHARED_TIMEOUT:.0f} s")
+            for name in frames:
+                self.load_status[name].update(state="loading", source="shared")
+            await asyncio.sleep(SHARED_POLL_INTERVAL)
+        async with self._shared_lock:
+            if self.shared.manifest()["generation"] == self._shared_generation:
+                return
+            manifest, mapped = await asyncio.to_thread(self.shared.read)
+            versions = manifest["versions"]
+            for name, collection in FRAME_COLLECTIONS.items():
+                if getattr(self, name) is None or versions.get(collection) != self._shared_versions.get(collection):
+                    self._set_frame(name, mapped[name])
+                else:
+                    # Same data from the new files: the version, and the results cached on it, stay valid
+                    setattr(self, name, mapped[name])
+                self.load_status[name].update(state="loaded", source="shared", rows=len(mapped[name]),
+                                              seconds=time.perf_counter() - started)
+            # The loader publishes the fact table with the frames, so it is never rebuilt per worker
+            if "fact_table" in mapped:
+                self._fact_table = mapped["fact_table"]
+                self._fact_versions = tuple(self.frame_versions[name] for name in FRAME_LOADERS)
+            self._shared_generation = manifest["generation"]
+            self._shared_versions = versions
 
-        return {
-            "total_products": total_products,
-            "reordered_products": reordered_products,
-            "percentage_reordered": percentage_reordered,
-        }
+    def _shared_failed(self, frames: Tuple[str, ...]):
+        for name in frames:
+            if self.load_status[name]["state"] == "loading":
+                self.load_status[name]["state"] = "failed"
 
-    async def analyze_hypothesis3(self) -> Dict[str, Any]:
-        await self.load_dataframes()
+    async def _save_snapshot(self, name: str, frame: pd.DataFrame, version: int):
+        try:
+            await asyncio.to_thread(self.snapshots.save, name, frame, version)
+        except Exception as e:
+            # The frame is already loaded; a missing snapshot only costs the next cold start
+            logging.warning(f"Could not write snapshot {name}: {str(e)}")
 
-        # aisles_id IDs for fruits, eggs, bread
-        aisles_id = [24, 36, 94]
+    async def _load_missing(self, missing: List[str]):
+        # Versions are read before the data so a write racing the load leaves the snapshot stale, not wrong
+        versions = await self.db_connector.get_collection_versions()
+        await asyncio.gather(*(self._load_frame(name, versions[FRAME_COLLECTIONS[name]]) for name in missing))
 
-        # Get product IDs for basic products
-        basic_products = self.products_df[self.products_df['aisle_id'].isin(aisles_id)]['aisle_id'].tolist()
+    async def load_dataframes(self, *frames: str):
+        """Load `frames` (all of them by default) that are missing or stale."""
+        frames = frames or tuple(FRAME_LOADERS)
+        if self.shared:
+            await self._attach_shared(frames)
+            return
+        while True:
+            await self._apply_pending()
+            missing = [name for name in frames if getattr(self, name) is None or name in self._stale]
+            if not missing:
+                return
+            if self._load_task is None or self._load_task.done():
+                self._load_task = asyncio.ensure_future(self._load_missing(missing))
+            # A cancelled request must not cancel the load other requests are waiting on
+            await asyncio.shield(self._load_task)
 
-        # Merge dataframes
-        merged_df = self.order_products_df.merge(self.orders_df, on="order_id")
-        basic_orders = merged_df[merged_df['product_id'].isin(basic_products)]
+    def mark_stale(self, *frames: str):
+        """Make the next load_dataframes read `frames` again."""
+        self._stale.update(frames)
 
-        # Categorize orders by time of day
-        basic_orders['time_of_day'] = basic_orders['order_hour_of_day'].apply(
-            lambda x: 'Morning' if 5 <= x < 12 else 'Evening' if 17 <= x <= 23 else 'Other'
-        )
-
-        morning_count = basic_orders[basic_orders['time_of_day'] == 'Morning'].shape[0]
-        evening_count = basic_orders[basic_orders['time_of_day'] == 'Evening'].shape[0]
+    def load_progress(self) -> Dict[str, Any]:
+        return {
+            "loading": self._load_task is not None and not self._load_task.done(),
+            "frames": self.load_status,
+            "result_cache": self.result_cache.stats(),
+            "shared_generation": self._shared_generation,
+        }
 
+    def memory_report(self) -> Dict[str, Any]:
+        """Per-column memory of every loaded frame (and the fact table), see frame_memory."""
+        frames = {name: getattr(self, name) for name in FRAME_LOADERS}
+        frames["fact_table"] = self._fact_table
+        report = {name: frame_memory(frame) for name, frame in frames.items() if frame is not None}
+        used = sum(frame["bytes"] for frame in report.values())
+        unnarrowed = sum(frame["unnarrowed_bytes"] for frame in report.values())
         return {
-            "morning_count": morning_count,
-            "evening_count": evening_count,
+            "bytes": used,
+            "unnarrowed_bytes": unnarrowed,
+            "reduction": round(unnarrowed / used, 2) if used else None,
+            "frames": report,
         }
 
-    async def analyze_hypothesis4(self) -> Dict[str, Any]:
+    async def fact_table(self) -> pd.DataFrame:
         await self.load_dataframes()
+        async with self._fact_lock:
+            versions = tuple(self.frame_versions[name] for name in FRAME_LOADERS)
+            if self._fact_table is None or self._fact_versions != versions:
+                with ANALYSIS_STAGE_SECONDS.labels(analysis="fact_table", stage="merge").time():
+                    self._fact_table = await asyncio.to_thread(
+                        build_fact_table, self.order_products_df, self.products_df, self.aisles_df,
+                        self.departments_df, self.orders_df
+                    )
+                self._fact_versions = versions
+                ANALYSIS_FRAME_BYTES.labels(frame="fact_table").set(
+                    int(self._fact_table.memory_usage(index=True, deep=True).sum())
+                )
+            return self._fact_table
 
-        # Merge dataframes
-        merged_df = self.order_products_df.merge(self.products_df, on="product_id")
-        merged_df = merged_df.merge(self.departments_df, on="department_id")
-
-        order_stats = merged_df.groupby('order_id').agg(
-            total_products=('product_id', 'count'),
-            unique_departments=('department_id', 'nunique')
-        ).reset_index()
-
-        correlation = order_stats['total_products'].corr(order_stats['unique_departments'])
+    async def _compute(self, function: Callable[..., Dict[str, Any]],
+                       frames: Dict[str, tuple]) -> Dict[str, Any]:
+        with ANALYSIS_STAGE_SECONDS.labels(analysis=function.__name__, stage="compute").time():
+            return await self.executor.run(function, frames)
 
-        return {
-            "average_departments": order_stats['unique_departments'].mean(),
-            "correlation": correlation,
-        }
+    def _frame_input(self, name: str) -> tuple:
+        return self.frame_versions[name], getattr(self, name)
 
-    async def analyze_hypothesis5(self) -> Dict[str, Any]:
-        await self.load_dataframes()
+    async def _fact_input(self) -> tuple:
+        fact_table = await self.fact_table()
+        return self._fact_versions, fact_table
 
-        merged_df = self.order_products_df.merge(self.orders_df, on="order_id")
+    @cached_analysis("order_products_df", "products_df", "aisles_df", "departments_df")
+    async def analyze_hypothesis1(self) -> Dict[str, Any]:
+        return await self._compute(hypotheses.hypothesis1, {"fact_table": await self._fact_input()})
 
-        merged_df['is_weekend'] = merged_df['order_dow'].apply(lambda x: x in [0, 1])
+    @cached_analysis("order_products_df")
+    async def analyze_hypothesis2(self) -> Dict[str, Any]:
+        return await self._compute(hypotheses.hypothesis2,
+                                   {"order_products_df": self._frame_input("order_products_df")})
 
-        order_counts = merged_df.groupby(['order_id', 'is_weekend']).size().reset_index(name='product_count')
+    @cached_analysis("products_df", "order_products_df", "orders_df")
+    async def analyze_hypothesis3(self) -> Dict[str, Any]:
+        return await self._compute(hypotheses.hypothesis3, {
+            "products_df": self._frame_input("products_df"),
+            "fact_table": await self._fact_input(),
+        })
 
-        avg_weekend = order_counts[order_counts['is_weekend'] == True]['product_count'].mean()
-        avg_weekday = order_counts[order_counts['is_weekend'] == False]['product_count'].mean()
+    @cached_analysis("order_products_df", "products_df", "departments_df")
+    async def analyze_hypothesis4(self) -> Dict[str, Any]:
+        return await self._compute(hypotheses.hypothesis4, {"fact_table": await self._fact_input()})
 
-        return {
-            "avg_weekend": avg_weekend,
-            "avg_weekday": avg_weekday,
-        }
+    @cached_analysis("order_products_df", "orders_df")
+    async def analyze_hypothesis5(self) -> Dict[str, Any]:
+        return await self._compute(hypotheses.hypothesis5, {"fact_table": await self._fact_input()})
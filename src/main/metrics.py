@@ -0,0 +1,53 @@
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+# Upper bounds in seconds, from a cached lookup to a cold analysis load
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def render_metrics() -> bytes:
+    """All metrics in the Prometheus text exposition format.
+
+    With PROMETHEUS_MULTIPROC_DIR set (see src/main/serve.py) every process writes its series to files
+    there, and the metrics of all of them are aggregated here, whichever worker answers.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last byte of its response.",
+    ("method", "route", "status"), buckets=DEFAULT_BUCKETS
+)
+TEMPLATE_RENDER_SECONDS = Histogram(
+    "template_render_seconds", "Time spent rendering a Jinja template.", ("template",), buckets=DEFAULT_BUCKETS
+)
+MONGODB_COMMAND_SECONDS = Histogram(
+    "mongodb_command_duration_seconds", "Duration of MongoDB commands as reported by the driver.",
+    ("collection", "command"), buckets=DEFAULT_BUCKETS
+)
+MONGODB_DOCUMENTS_RETURNED = Counter(
+    "mongodb_documents_returned_total", "Documents returned by MongoDB commands.", ("collection", "command")
+)
+MONGODB_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total", "MongoDB commands that failed.", ("collection", "command")
+)
+ANALYSIS_STAGE_SECONDS = Histogram(
+    "analysis_stage_duration_seconds",
+    "Time of each analysis stage: load (DataFrames), merge (fact table), compute (pandas), aggregate (MongoDB).",
+    ("analysis", "stage"), buckets=DEFAULT_BUCKETS
+)
+# Gauges are kept per process with PROMETHEUS_MULTIPROC_DIR: each worker maps or loads its own frames,
+# and the cache counts of the workers add up
+ANALYSIS_FRAME_BYTES = Gauge(
+    "analysis_frame_bytes", "Memory used by each loaded analysis DataFrame, including its index.", ("frame",),
+    multiprocess_mode="all"
+)
+CACHE_HITS = Gauge("cache_hits", "Hits of the document and analysis result caches.", ("cache",),
+                   multiprocess_mode="sum")
+CACHE_MISSES = Gauge("cache_misses", "Misses of the document and analysis result caches.", ("cache",),
+                     multiprocess_mode="sum")
@@ -0,0 +1,75 @@
+"""Production entry point: several uvicorn workers sharing one copy of the analysis data.
+
+    python -m src.main.serve --workers 4 --port 8000
+
+A single loader process reads the analysis DataFrames from MongoDB, builds the fact table and
+publishes them as Arrow files in ANALYSIS_SHARED_DIR (a temporary directory by default). The
+workers memory-map those files read-only instead of loading their own copies, so adding workers
+adds CPU for requests without adding copies of the data. The loader polls the collection versions
+every ANALYSIS_REFRESH_INTERVAL seconds and publishes a new generation after any write. Metrics of
+every process are collected in PROMETHEUS_MULTIPROC_DIR (also temporary by default).
+
+src/main/app.py remains the single-process development entry point.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import uvicorn
+from dotenv import find_dotenv, load_dotenv
+
+
+def start_loader(directory: str):
+    # Imported here so this supervising process never loads pandas itself
+    from src.main.eda.loader import run_loader
+
+    run_loader(directory)
+
+
+def main():
+    load_dotenv(find_dotenv())
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count())
+    args = parser.parse_args()
+
+    directory = os.getenv("ANALYSIS_SHARED_DIR")
+    temporary = directory is None
+    if temporary:
+        directory = tempfile.mkdtemp(prefix="analysis-shared-")
+    # Inherited by the workers, which map the frames instead of loading them
+    os.environ["ANALYSIS_SHARED_DIR"] = directory
+    # Every worker has its own document caches and counters; they must see the writes of the others
+    os.environ.setdefault("DB_CACHE_REVALIDATE", "1")
+    # Every process writes its metrics there, so /metrics reports the whole server whichever worker answers
+    metrics_directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    temporary_metrics = metrics_directory is None
+    if temporary_metrics:
+        metrics_directory = tempfile.mkdtemp(prefix="metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_directory
+    else:
+        # Files of a previous run would add its series to this one
+        for path in Path(metrics_directory).glob("*.db"):
+            path.unlink()
+
+    # spawn keeps the loader free of anything this process imported or opened
+    loader = multiprocessing.get_context("spawn").Process(target=start_loader, args=(directory,),
+                                                          name="analysis-loader", daemon=True)
+    loader.start()
+    try:
+        uvicorn.run("src.main.ui.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        loader.terminate()
+        loader.join()
+        if temporary:
+            shutil.rmtree(directory, ignore_errors=True)
+        if temporary_metrics:
+            shutil.rmtree(metrics_directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class StartupReport:
+    """Wall time and peak memory of each startup stage, including the ones deferred to first use."""
+
+    def __init__(self):
+        self.stages: List[Dict[str, Any]] = []
+        self._last_mark = time.perf_counter()
+
+    def record(self, stage: str, seconds: float):
+        entry = {"stage": stage, "seconds": round(seconds, 4), "peak_rss_mb": peak_rss_mb()}
+        self.stages.append(entry)
+        logger.info(f"Startup stage {stage} took {entry['seconds']}s, peak RSS {entry['peak_rss_mb']} MB")
+
+    def mark(self, stage: str):
+        """Record the time elapsed since the report was created or since the previous mark."""
+        now = time.perf_counter()
+        self.record(stage, now - self._last_mark)
+        self._last_mark = now
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        yield
+        self.record(stage, time.perf_counter() - started)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"stages": self.stages, "peak_rss_mb": peak_rss_mb()}
+
+
+startup_report = StartupReport()
@@ -1,29 +1,48 @@
-import os
+from typing import Optional
 
 import fastapi.routing
-from fastapi import HTTPException, Query
+from fastapi import Depends, HTTPException, Query, Request
 from src.main.db.connector import DBConnector
+from src.main.ui.api.bulk import run_bulk
+from src.main.ui.api.responses import page_response
+from src.main.ui.dependencies import get_db
 from src.main.ui.models import AisleModel, UpdateAisleModel
 
-
-db = DBConnector(conn_id=os.getenv("DB_CONN"))
 aisle_router = fastapi.routing.APIRouter(prefix="/api/v1", tags=["aisles"])
 
 
 @aisle_router.post("/aisles", response_description="Add new aisle")
-async def create_aisle(aisle: AisleModel):
+async def create_aisle(aisle: AisleModel, db: DBConnector = Depends(get_db)):
     new_aisle = await db.add_aisle(aisle.dict())
     return new_aisle
 
 
-@aisle_router.get("/aisles", response_description="List aisles with pagination")
-async def get_aisles(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100)):
-    result = await db.retrieve_aisles(skip=skip, limit=limit)
-    return result
+@aisle_router.post("/aisles/bulk", response_description="Insert, update or delete aisles in bulk")
+async def bulk_aisles(request: Request, ordered: bool = Query(True),
+                      batch_size: int = Query(1000, ge=1, le=10000),
+                      db: DBConnector = Depends(get_db)):
+    return await run_bulk(request, db, "aisles", AisleModel, UpdateAisleModel, ordered, batch_size)
+
+
+@aisle_router.get("/aisles", response_description="List aisles with pagination and filters")
+async def get_aisles(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100),
+                     cursor: Optional[str] = Query(None), include_total: bool = Query(True),
+                     aisle_id: Optional[int] = Query(None),
+                     explain: bool = Query(False), db: DBConnector = Depends(get_db)):
+    filters = {"aisle_id": aisle_id}
+    filters = {k: v for k, v in filters.items() if v is not None}
+    try:
+        if explain:
+            return await db.explain_page("aisles", skip=skip, limit=limit, cursor=cursor, filters=filters)
+        result = await db.retrieve_aisles(skip=skip, limit=limit, cursor=cursor,
+                                          include_total=include_total, filters=filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page_response(result)
 
 
 @aisle_router.get("/aisles/{id}", response_description="Read a single aisle")
-async def get_aisle(id:str):
+async def get_aisle(id:str, db: DBConnector = Depends(get_db)):
     aisle = await db.retrieve_aisle(id)
     if aisle:
         return aisle
@@ -31,18 +50,17 @@ async def get_aisle(id:str):
 
 
 @aisle_router.put("/aisles", response_description="Update an aisle")
-async def update_aisle(aisle: UpdateAisleModel, id: str = Query()):
+async def update_aisle(aisle: UpdateAisleModel, id: str = Query(), db: DBConnector = Depends(get_db)):
     aisle_data = {k: v for k, v in aisle.dict().items() if v is not None}
     if len(aisle_data) >= 1:
-        updated = await db.update_aisle(id, aisle_data)
-        if updated:
-            updated_aisle = await db.retrieve_aisle(id)
+        updated_aisle = await db.update_aisle(id, aisle_data)
+        if updated_aisle:
             return updated_aisle
     raise HTTPException(status_code=404, detail=f"Aisle {id} not found")
 
 
 @aisle_router.delete("/aisles", response_description="Delete an aisle")
-async def delete_aisle(id: str = Query()):
+async def delete_aisle(id: str = Query(), db: DBConnector = Depends(get_db)):
     deleted = await db.delete_aisle(id)
     if deleted:
         return {"message": f"Aisle {id} deleted successfully"}
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import math
+from typing import TYPE_CHECKING, Any, Dict
+
+import fastapi.routing
+from fastapi import Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from src.main.ui.dependencies import get_analysis_jobs
+from src.main.ui.models import AnalysisJobModel
+
+if TYPE_CHECKING:
+    from src.main.eda.jobs import AnalysisJobs
+
+jobs_router = fastapi.routing.APIRouter(prefix="/api/v1", tags=["analysis"])
+
+# Seconds between two progress checks of the event stream
+EVENTS_INTERVAL = 0.5
+
+
+def json_safe(job: Dict[str, Any]) -> Dict[str, Any]:
+    # Hypotheses can yield NaN (e.g. an undefined correlation), which JSON cannot carry
+    result = job.get("result")
+    if result:
+        job = {**job, "result": {k: None if isinstance(v, float) and math.isnan(v) else v for k, v in result.items()}}
+    return job
+
+
+@jobs_router.post("/analysis/jobs", response_description="Start or join an analysis job")
+async def create_job(job: AnalysisJobModel, jobs: "AnalysisJobs" = Depends(get_analysis_jobs)):
+    return json_safe(await jobs.submit(job.hypothesis))
+
+
+@jobs_router.get("/analysis/jobs/{job_id}", response_description="Read the state and result of an analysis job")
+async def get_job(job_id: str, jobs: "AnalysisJobs" = Depends(get_analysis_jobs)):
+    job = await jobs.get(job_id)
+    if job:
+        return json_safe(job)
+    raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+
+@jobs_router.get("/analysis/jobs/{job_id}/events", response_description="Stream analysis job progress as SSE")
+async def job_events(job_id: str, request: Request, jobs: "AnalysisJobs" = Depends(get_analysis_jobs)):
+    if await jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    async def stream():
+        last = None
+        while True:
+            job = await jobs.get(job_id)
+            event = json.dumps(json_safe(job), default=str)
+            if event != last:
+                yield f"event: {job['state']}\ndata: {event}\n\n"
+                last = event
+            if job["state"] in ("done", "failed") or await request.is_disconnected():
+                return
+            await asyncio.sleep(EVENTS_INTERVAL)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,129 @@
+import json
+from typing import Any, AsyncIterator, Dict, List, Tuple, Type, Union
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from pymongo import DeleteOne, InsertOne, UpdateOne
+
+from src.main.db.connector import DBConnector
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+async def iter_bulk_items(request: Request) -> AsyncIterator[Any]:
+    """Yield the items of a JSON array body, or the raw lines of an NDJSON body as they stream in."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_MEDIA_TYPES:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+    try:
+        items = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body is not valid JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array or an NDJSON body")
+    for item in items:
+        yield item
+
+
+def build_operation(item: Any, model: Type[BaseModel],
+                    update_model: Type[BaseModel]) -> Tuple[Union[InsertOne, UpdateOne, DeleteOne], str]:
+    """Validate one bulk item and turn it into a write operation.
+
+    Items are flat objects with an optional `op` (insert, update or delete, default insert);
+    update and delete also need the `id` of the document.
+    """
+    if isinstance(item, (bytes, str)):
+        item = json.loads(item)
+    if not isinstance(item, dict):
+        raise ValueError("Expected a JSON object")
+    item = dict(item)
+    op = item.pop("op", "insert")
+    if op == "insert":
+        document = model.model_validate(item).model_dump()
+        document["_id"] = ObjectId()
+        return InsertOne(document), str(document["_id"])
+    if op not in ("update", "delete"):
+        raise ValueError(f"Unknown op {op}")
+    if "id" not in item:
+        raise ValueError(f"Missing id for {op}")
+    try:
+        object_id = ObjectId(item.pop("id"))
+    except (InvalidId, TypeError):
+        raise ValueError("Invalid id")
+    if op == "delete":
+        return DeleteOne({"_id": object_id}), str(object_id)
+    data = {k: v for k, v in update_model.model_validate(item).model_dump().items() if v is not None}
+    if not data:
+        raise ValueError("Nothing to update")
+    return UpdateOne({"_id": object_id}, {"$set": data}), str(object_id)
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+async def run_bulk(request: Request, db: DBConnector, collection_name: str, model: Type[BaseModel],
+                   update_model: Type[BaseModel], ordered: bool, batch_size: int) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    totals = {"inserted": 0, "modified": 0, "deleted": 0}
+    operations = []
+    positions: List[Tuple[int, str]] = []
+    stopped = False
+
+    async def flush():
+        nonlocal stopped
+        outcome = await db.bulk_write(collection_name, operations, ordered=ordered)
+        for key in totals:
+            totals[key] += outcome[key]
+        for position, (index, object_id) in enumerate(positions):
+            if position in outcome["errors"]:
+                results.append({"index": index, "ok": False, "error": outcome["errors"][position]})
+            elif position in outcome["skipped"]:
+                results.append({"index": index, "ok": False, "error": "Not executed"})
+            else:
+                results.append({"index": index, "ok": True, "id": object_id})
+        stopped = stopped or (ordered and bool(outcome["errors"]))
+        operations.clear()
+        positions.clear()
+
+    index = 0
+    async for item in iter_bulk_items(request):
+        if stopped:
+            results.append({"index": index, "ok": False, "error": "Not executed"})
+        else:
+            try:
+                operation, object_id = build_operation(item, model, update_model)
+                operations.append(operation)
+                positions.append((index, object_id))
+            except ValueError as e:
+                # Ordered batches must not run anything past the first failure
+                if ordered:
+                    await flush()
+                    stopped = True
+                results.append({"index": index, "ok": False, "error": _error_message(e)})
+            if len(operations) >= batch_size:
+                await flush()
+        index += 1
+    if operations:
+        await flush()
+    results.sort(key=lambda result: result["index"])
+
+    return {
+        "ordered": ordered,
+        **totals,
+        "errors": sum(1 for result in results if not result["ok"]),
+        "results": results
+    }
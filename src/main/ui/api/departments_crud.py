@@ -1,28 +1,48 @@
-import os
+from typing import Optional
 
 import fastapi.routing
-from fastapi import HTTPException, Query
+from fastapi import Depends, HTTPException, Query, Request
 from src.main.db.connector import DBConnector
+from src.main.ui.api.bulk import run_bulk
+from src.main.ui.api.responses import page_response
+from src.main.ui.dependencies import get_db
 from src.main.ui.models import DepartmentModel, UpdateDepartmentModel
 
-db = DBConnector(conn_id=os.getenv("DB_CONN"))
 departments_router = fastapi.routing.APIRouter(prefix="/api/v1", tags=["departments"])
 
 
 @departments_router.post("/departments", response_description="Add new department")
-async def create_department(department: DepartmentModel):
+async def create_department(department: DepartmentModel, db: DBConnector = Depends(get_db)):
     new_department = await db.add_department(department.dict())
     return new_department
 
 
-@departments_router.get("/departments", response_description="List departments with pagination")
-async def get_departments(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100)):
-    result = await db.retrieve_departments(skip=skip, limit=limit)
-    return result
+@departments_router.post("/departments/bulk", response_description="Insert, update or delete departments in bulk")
+async def bulk_departments(request: Request, ordered: bool = Query(True),
+                           batch_size: int = Query(1000, ge=1, le=10000),
+                           db: DBConnector = Depends(get_db)):
+    return await run_bulk(request, db, "departments", DepartmentModel, UpdateDepartmentModel, ordered, batch_size)
+
+
+@departments_router.get("/departments", response_description="List departments with pagination and filters")
+async def get_departments(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100),
+                          cursor: Optional[str] = Query(None), include_total: bool = Query(True),
+                          department_id: Optional[int] = Query(None),
+                          explain: bool = Query(False), db: DBConnector = Depends(get_db)):
+    filters = {"department_id": department_id}
+    filters = {k: v for k, v in filters.items() if v is not None}
+    try:
+        if explain:
+            return await db.explain_page("departments", skip=skip, limit=limit, cursor=cursor, filters=filters)
+        result = await db.retrieve_departments(skip=skip, limit=limit, cursor=cursor,
+                                               include_total=include_total, filters=filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page_response(result)
 
 
 @departments_router.get("/departments/{id}", response_description="Get a single department")
-async def get_department(id: str):
+async def get_department(id: str, db: DBConnector = Depends(get_db)):
     department = await db.retrieve_department(id)
     if department:
         return department
@@ -30,18 +50,18 @@ async def get_department(id: str):
 
 
 @departments_router.put("/departments", response_description="Update a department")
-async def update_department(department: UpdateDepartmentModel, id: str = Query()):
+async def update_department(department: UpdateDepartmentModel, id: str = Query(),
+                            db: DBConnector = Depends(get_db)):
     department_data = {k: v for k, v in department.model_dump().items() if v is not None}
     if len(department_data) >= 1:
-        updated = await db.update_department(id, department_data)
-        if updated:
-            updated_department = await db.retrieve_department(id)
+        updated_department = await db.update_department(id, department_data)
+        if updated_department:
             return updated_department
     raise HTTPException(status_code=404, detail=f"Department {id} not found")
 
 
 @departments_router.delete("/departments", response_description="Delete a department")
-async def delete_department(id: str = Query()):
+async def delete_department(id: str = Query(), db: DBConnector = Depends(get_db)):
     deleted = await db.delete_department(id)
     if deleted:
         return {"message": f"Department {id} deleted successfully"}
@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+import math
+from typing import Any, AsyncIterator, List
+
+import fastapi.routing
+from fastapi import Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from src.main.db.connector import COLLECTION_FIELDS, DBConnector
+from src.main.ui.dependencies import get_db
+
+export_router = fastapi.routing.APIRouter(prefix="/api/v1", tags=["export"])
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def clean_row(row: List[Any]) -> List[Any]:
+    # Imported data can hold NaN (e.g. days_since_prior_order of first orders), which JSON cannot carry
+    return [None if isinstance(value, float) and math.isnan(value) else value for value in row]
+
+
+async def encode_ndjson(columns: List[str], batches: AsyncIterator[List[List[Any]]]) -> AsyncIterator[str]:
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    async for rows in batches:
+        yield "".join(dumps(dict(zip(columns, clean_row(row)))) + "\n" for row in rows)
+
+
+async def encode_csv(columns: List[str], batches: AsyncIterator[List[List[Any]]]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for rows in batches:
+        writer.writerows(clean_row(row) for row in rows)
+        # One chunk per batch, then the buffer is reused so memory does not grow with the collection
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# Registered before the collection routers, otherwise /orders/export would match /orders/{id}
+@export_router.get("/{collection}/export", response_description="Stream a whole collection as NDJSON or CSV")
+async def export_collection(collection: str, format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+                            batch_size: int = Query(5000, ge=1, le=100000),
+                            db: DBConnector = Depends(get_db)):
+    if collection not in COLLECTION_FIELDS:
+        raise HTTPException(status_code=404, detail=f"Collection {collection} not found")
+    columns = ["id", *COLLECTION_FIELDS[collection]]
+    batches = db.iter_row_batches(collection, batch_size)
+    encode = encode_csv if format == "csv" else encode_ndjson
+    return StreamingResponse(
+        encode(columns, batches),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{collection}.{format}"'}
+    )
@@ -1,11 +1,14 @@
-import os
+from typing import Optional
 
 import fastapi.routing
-from fastapi import FastAPI, Body, HTTPException, Query
+from fastapi import FastAPI, Body, Depends, HTTPException, Query, Request
 from fastapi.encoders import jsonable_encoder
 
 from src.main.ui.models import OrderModel, UpdateOrderModel
 from src.main.db.connector import DBConnector
+from src.main.ui.api.bulk import run_bulk
+from src.main.ui.api.responses import page_response
+from src.main.ui.dependencies import get_db
 
 
 async def get_orders(db_conn):
@@ -13,25 +16,42 @@ async def get_orders(db_conn):
     return orders
 
 
-db = DBConnector(conn_id=os.getenv("DB_CONN"))
 router = fastapi.routing.APIRouter(prefix="/api/v1", tags=["orders"])
 
 
 @router.post("/orders", response_description="Add new order")
-async def create_order(order: OrderModel = Body(...)):
+async def create_order(order: OrderModel = Body(...), db: DBConnector = Depends(get_db)):
     order = jsonable_encoder(order)
     new_order = await db.add_order(order)
     return new_order
 
 
-@router.get("/orders", response_description="List orders with pagination")
-async def get_orders(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100)):
-    orders = await db.retrieve_orders(skip=skip, limit=limit)
-    return orders
+@router.post("/orders/bulk", response_description="Insert, update or delete orders in bulk")
+async def bulk_orders(request: Request, ordered: bool = Query(True),
+                      batch_size: int = Query(1000, ge=1, le=10000),
+                      db: DBConnector = Depends(get_db)):
+    return await run_bulk(request, db, "orders", OrderModel, UpdateOrderModel, ordered, batch_size)
+
+
+@router.get("/orders", response_description="List orders with pagination and filters")
+async def get_orders(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100),
+                     cursor: Optional[str] = Query(None), include_total: bool = Query(True),
+                     user_id: Optional[int] = Query(None), order_id: Optional[int] = Query(None),
+                     explain: bool = Query(False), db: DBConnector = Depends(get_db)):
+    filters = {"user_id": user_id, "order_id": order_id}
+    filters = {k: v for k, v in filters.items() if v is not None}
+    try:
+        if explain:
+            return await db.explain_page("orders", skip=skip, limit=limit, cursor=cursor, filters=filters)
+        orders = await db.retrieve_orders(skip=skip, limit=limit, cursor=cursor,
+                                          include_total=include_total, filters=filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page_response(orders)
 
 
 @router.get("/orders/{id}", response_description="Read a single order")
-async def get_order(id: str):
+async def get_order(id: str, db: DBConnector = Depends(get_db)):
     order = await db.retrieve_order(id)
     if order:
         return order
@@ -39,18 +59,18 @@ async def get_order(id: str):
 
 
 @router.put("/orders", response_description="Update an order")
-async def update_order(id: str = Query(), order: UpdateOrderModel = Body(...)):
+async def update_order(id: str = Query(), order: UpdateOrderModel = Body(...),
+                       db: DBConnector = Depends(get_db)):
     order_data = {k: v for k, v in order.dict().items() if v is not None}
     if len(order_data) >= 1:
-        updated = await db.update_order(id, order_data)
-        if updated:
-            updated_order = await db.retrieve_order(id)
+        updated_order = await db.update_order(id, order_data)
+        if updated_order:
             return updated_order
     raise HTTPException(status_code=404, detail=f"Order {id} not found")
 
 
 @router.delete("/orders", response_description="Delete an order")
-async def delete_order(id: str = Query()):
+async def delete_order(id: str = Query(), db: DBConnector = Depends(get_db)):
     deleted = await db.delete_order(id)
     if deleted:
         return {"message": f"Order {id} deleted successfully"}
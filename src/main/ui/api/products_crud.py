@@ -1,28 +1,49 @@
-import os
+from typing import Optional
 
 import fastapi.routing
-from fastapi import HTTPException, Query
+from fastapi import Depends, HTTPException, Query, Request
 from src.main.db.connector import DBConnector
+from src.main.ui.api.bulk import run_bulk
+from src.main.ui.api.responses import page_response
+from src.main.ui.dependencies import get_db
 from src.main.ui.models import ProductModel, UpdateProductModel
 
-db = DBConnector(conn_id=os.getenv("DB_CONN"))
 products_router = fastapi.routing.APIRouter(prefix="/api/v1", tags=["products"])
 
 
 @products_router.post("/products", response_description="Add new product")
-async def create_product(product: ProductModel):
+async def create_product(product: ProductModel, db: DBConnector = Depends(get_db)):
     new_product = await db.add_product(product.dict())
     return new_product
 
 
-@products_router.get("/products", response_description="List products with pagination")
-async def get_products(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100)):
-    result = await db.retrieve_products(skip=skip, limit=limit)
-    return result
+@products_router.post("/products/bulk", response_description="Insert, update or delete products in bulk")
+async def bulk_products(request: Request, ordered: bool = Query(True),
+                        batch_size: int = Query(1000, ge=1, le=10000),
+                        db: DBConnector = Depends(get_db)):
+    return await run_bulk(request, db, "products", ProductModel, UpdateProductModel, ordered, batch_size)
+
+
+@products_router.get("/products", response_description="List products with pagination and filters")
+async def get_products(skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100),
+                       cursor: Optional[str] = Query(None), include_total: bool = Query(True),
+                       product_id: Optional[int] = Query(None), aisle_id: Optional[int] = Query(None),
+                       department_id: Optional[int] = Query(None),
+                       explain: bool = Query(False), db: DBConnector = Depends(get_db)):
+    filters = {"product_id": product_id, "aisle_id": aisle_id, "department_id": department_id}
+    filters = {k: v for k, v in filters.items() if v is not None}
+    try:
+        if explain:
+            return await db.explain_page("products", skip=skip, limit=limit, cursor=cursor, filters=filters)
+        result = await db.retrieve_products(skip=skip, limit=limit, cursor=cursor,
+                                            include_total=include_total, filters=filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page_response(result)
 
 
 @products_router.get("/products/{id}", response_description="Get a single product")
-async def get_product(id: str):
+async def get_product(id: str, db: DBConnector = Depends(get_db)):
     product = await db.retrieve_product(id)
     if product:
         return product
@@ -30,18 +51,17 @@ async def get_product(id: str):
 
 
 @products_router.put("/products", response_description="Update a product")
-async def update_product(product: UpdateProductModel, id: str = Query()):
+async def update_product(product: UpdateProductModel, id: str = Query(), db: DBConnector = Depends(get_db)):
     product_data = {k: v for k, v in product.dict().items() if v is not None}
     if len(product_data) >= 1:
-        updated = await db.update_product(id, product_data)
-        if updated:
-            updated_product = await db.retrieve_product(id)
+        updated_product = await db.update_product(id, product_data)
+        if updated_product:
             return updated_product
     raise HTTPException(status_code=404, detail=f"Product {id} not found")
 
 
 @products_router.delete("/products", response_description="Delete a product")
-async def delete_product(id: str = Query()):
+async def delete_product(id: str = Query(), db: DBConnector = Depends(get_db)):
     deleted = await db.delete_product(id)
     if deleted:
         return {"message": f"Product {id} deleted successfully"}
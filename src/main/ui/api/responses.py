@@ -0,0 +1,12 @@
+from typing import Any, Dict
+
+from fastapi.responses import ORJSONResponse
+
+
+def page_response(page: Dict[str, Any]) -> ORJSONResponse:
+    """Response of the list endpoints.
+
+    The rows go straight to orjson instead of through jsonable_encoder, which would walk every
+    field of every row before serializing it.
+    """
+    return ORJSONResponse(page)
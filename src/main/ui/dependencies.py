@@ -0,0 +1,34 @@
+from typing import TYPE_CHECKING
+
+from fastapi import Request
+
+from src.main.db.connector import DBConnector
+from src.main.startup import startup_report
+
+if TYPE_CHECKING:
+    from src.main.eda.jobs import AnalysisJobs
+    from src.main.eda.utils import DataAnalysis
+
+
+# The application-scoped objects are created by the lifespan hook in src/main/ui/main.py
+def get_db(request: Request) -> DBConnector:
+    return request.app.state.db
+
+
+async def get_data_analysis(request: Request) -> "DataAnalysis":
+    # The analysis pulls in pandas and its own state, so it is only built on the first /analysis request.
+    # Being a coroutine without awaits, this runs on the event loop and cannot build it twice.
+    state = request.app.state
+    if state.data_analysis is None:
+        with startup_report.measure("import analysis"):
+            from src.main.eda.jobs import AnalysisJobs
+            from src.main.eda.utils import DataAnalysis
+        with startup_report.measure("create analysis"):
+            state.data_analysis = DataAnalysis(db_connector=state.db)
+            state.analysis_jobs = AnalysisJobs(state.data_analysis)
+    return state.data_analysis
+
+
+async def get_analysis_jobs(request: Request) -> "AnalysisJobs":
+    await get_data_analysis(request)
+    return request.app.state.analysis_jobs
@@ -0,0 +1,136 @@
+import collections
+import os
+import sys
+import threading
+import time
+from typing import Any, Counter, Dict
+
+from fastapi.templating import Jinja2Templates
+
+from src.main.metrics import HTTP_REQUEST_SECONDS, TEMPLATE_RENDER_SECONDS
+
+# Requests carrying this header get a profile instead of their response, when profiling is enabled
+PROFILE_HEADER = b"x-profile"
+PROFILE_INTERVAL = float(os.getenv("PROFILING_INTERVAL", "0.001"))
+
+
+class MetricsMiddleware:
+    """Times every HTTP request into http_request_duration_seconds, labelled with its route template.
+
+    The time runs until the last byte of the body, so streamed exports and event streams count in full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; mounts (static files) only set root_path.
+            # Labelling with the template rather than the path keeps the number of series bounded.
+            route = scope.get("route")
+            label = route.path if route is not None else scope.get("root_path") or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(method=scope["method"], route=label,
+                                        status=str(status)).observe(time.perf_counter() - started)
+
+
+class TimedTemplates(Jinja2Templates):
+    """Jinja2Templates recording the render time of each template in template_render_seconds."""
+
+    def TemplateResponse(self, name: str, context: Dict[str, Any], **kwargs):
+        with TEMPLATE_RENDER_SECONDS.labels(template=name).time():
+            return super().TemplateResponse(name, context, **kwargs)
+
+
+class StackSampler:
+    """Samples the Python stacks of every thread at a fixed interval.
+
+    The result is in the folded format (`frame;frame;frame count` per line) read by flamegraph.pl,
+    speedscope and similar tools.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter[str] = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfilingMiddleware:
+    """Answers requests sent with an `X-Profile` header with the folded stack samples taken while
+    the app handled them, instead of the normal response.
+
+    The sampler sees every thread, so requests served concurrently show up in the profile too.
+    Only installed when PROFILING_ENABLED=true.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or PROFILE_HEADER not in dict(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def discard(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        sampler = StackSampler()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            sampler.stop()
+        body = sampler.folded().encode()
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+            (b"x-profile-status", str(status).encode()),
+            (b"x-profile-samples", str(sampler.samples).encode()),
+            (b"x-profile-seconds", f"{time.perf_counter() - started:.4f}".encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
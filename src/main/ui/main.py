@@ -1,23 +1,70 @@
+# Imported first so the startup report includes the cost of the imports below
+from src.main.startup import startup_report
+
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from prometheus_client import CONTENT_TYPE_LATEST
+from pymongo.errors import DuplicateKeyError
 
-from src.main.eda.utils import DataAnalysis
+from src.main.db.connector import DBConnector
+from src.main.metrics import CACHE_HITS, CACHE_MISSES, render_metrics
+from src.main.ui.api.analysis_jobs import jobs_router
 from src.main.ui.api.aisles_crud import aisle_router
 from src.main.ui.api.departments_crud import departments_router
+from src.main.ui.api.export import export_router
 from src.main.ui.api.orders_crud import router
 from src.main.ui.api.products_crud import products_router
-
-app = FastAPI(title="InstaCart CRUD")
+from src.main.ui.dependencies import get_analysis_jobs, get_data_analysis, get_db
+from src.main.ui.instrumentation import MetricsMiddleware, ProfilingMiddleware, TimedTemplates
+
+if TYPE_CHECKING:
+    from src.main.eda.utils import DataAnalysis
+
+startup_report.mark("import app")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One connector, and so one Motor connection pool, for every router and the analysis
+    with startup_report.measure("create db connector"):
+        db = DBConnector(conn_id=os.getenv("DB_CONN"))
+    if os.getenv("DB_ENSURE_INDEXES", "true").lower() == "true":
+        with startup_report.measure("ensure indexes"):
+            await db.ensure_indexes()
+    app.state.db = db
+    # Created by get_data_analysis on the first /analysis request
+    app.state.data_analysis = None
+    app.state.analysis_jobs = None
+    yield
+    if app.state.data_analysis is not None:
+        app.state.data_analysis.executor.shutdown()
+    await db.flush_versions()
+    db.close()
+
+
+# orjson also turns the NaN days_since_prior_order of first orders into null
+app = FastAPI(title="InstaCart CRUD", lifespan=lifespan, default_response_class=ORJSONResponse)
+app.include_router(router=export_router)
 app.include_router(router=router)
 app.include_router(router=aisle_router)
 app.include_router(router=departments_router)
 app.include_router(router=products_router)
+app.include_router(router=jobs_router)
+
+
+@app.exception_handler(DuplicateKeyError)
+async def duplicate_key_handler(request: Request, exc: DuplicateKeyError):
+    # Raised by the unique indexes, e.g. a second order with the same order_id
+    key = (exc.details or {}).get("keyValue")
+    return JSONResponse(status_code=409, content={"detail": f"Duplicate key {key}"})
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +73,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+# Opt-in, as a profiled request is answered with its stack samples instead of its response
+if os.getenv("PROFILING_ENABLED", "false").lower() == "true":
+    app.add_middleware(ProfilingMiddleware)
 # Get the directory of the current file
 BASE_DIR = Path(__file__).resolve().parent
 
@@ -35,8 +86,9 @@ templates_dir = BASE_DIR / "templates"
 
 app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
 
-templates = Jinja2Templates(directory=str(templates_dir))
-data_analysis = DataAnalysis(conn_id=os.getenv("DB_CONN"))
+templates = TimedTemplates(directory=str(templates_dir))
+# How long a hypothesis page waits for its job before rendering a self-refreshing progress page
+ANALYSIS_PAGE_WAIT = float(os.getenv("ANALYSIS_PAGE_WAIT", "20"))
 
 
 @app.get("/orders", response_class=HTMLResponse)
@@ -68,32 +120,67 @@ async def index_ui(request: Request):
 async def analysis_ui(request: Request):
     return templates.TemplateResponse("analysis.html", {"request": request})
 
+@app.get("/analysis/status", response_description="Progress and timings of the analysis data load")
+async def analysis_status(data_analysis: "DataAnalysis" = Depends(get_data_analysis)):
+    return data_analysis.load_progress()
+
+
+@app.get("/analysis/memory", response_description="Memory used by each column of the loaded analysis DataFrames")
+async def analysis_memory(data_analysis: "DataAnalysis" = Depends(get_data_analysis)):
+    return data_analysis.memory_report()
+
+
+@app.get("/startup", response_description="Time and memory spent on each startup stage")
+async def startup_status():
+    return startup_report.as_dict()
+
+
+@app.get("/cache", response_description="Size, hits and misses of the document caches")
+async def cache_status(db: DBConnector = Depends(get_db)):
+    return db.cache_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse, response_description="Metrics in the Prometheus text format")
+async def metrics(request: Request, db: DBConnector = Depends(get_db)):
+    caches = dict(db.cache_stats())
+    if request.app.state.data_analysis is not None:
+        caches["analysis_results"] = request.app.state.data_analysis.result_cache.stats()
+    for name, stats in caches.items():
+        CACHE_HITS.labels(cache=name).set(stats["hits"])
+        CACHE_MISSES.labels(cache=name).set(stats["misses"])
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
+async def hypothesis_page(request: Request, hypothesis: int) -> HTMLResponse:
+    jobs = await get_analysis_jobs(request)
+    job = await jobs.submit(hypothesis)
+    job = await jobs.wait(job["id"], timeout=ANALYSIS_PAGE_WAIT)
+    if job["state"] != "done":
+        return templates.TemplateResponse("analysis_pending.html", {"request": request, "job": job})
+    return templates.TemplateResponse(f"hypothesis{hypothesis}.html", {"request": request, "result": job["result"]})
+
+
 @app.get("/analysis/hypothesis1", response_class=HTMLResponse)
 async def hypothesis1(request: Request):
-    result = await data_analysis.analyze_hypothesis1()
-    return templates.TemplateResponse("hypothesis1.html", {"request": request, "result": result})
+    return await hypothesis_page(request, 1)
 
 
 @app.get("/analysis/hypothesis2", response_class=HTMLResponse)
 async def hypothesis2(request: Request):
-    result = await data_analysis.analyze_hypothesis2()
-    return templates.TemplateResponse("hypothesis2.html", {"request": request, "result": result})
+    return await hypothesis_page(request, 2)
 
 
 @app.get("/analysis/hypothesis3", response_class=HTMLResponse)
 async def hypothesis2(request: Request):
-    result = await data_analysis.analyze_hypothesis3()
-    return templates.TemplateResponse("hypothesis3.html", {"request": request, "result": result})
+    return await hypothesis_page(request, 3)
 
 
 @app.get("/analysis/hypothesis4", response_class=HTMLResponse)
 async def hypothesis2(request: Request):
-    result = await data_analysis.analyze_hypothesis4()
-    return templates.TemplateResponse("hypothesis4.html", {"request": request, "result": result})
+    return await hypothesis_page(request, 4)
 
 
 @app.get("/analysis/hypothesis5", response_class=HTMLResponse)
 async def hypothesis2(request: Request):
-    result = await data_analysis.analyze_hypothesis5()
-    return templates.TemplateResponse("hypothesis5.html", {"request": request, "result": result})
+    return await hypothesis_page(request, 5)
 
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
 
@@ -49,3 +49,7 @@ class UpdateProductModel(BaseModel):
     product_name: Optional[str]
     aisle_id: Optional[int]
     department_id: Optional[int]
+
+
+class AnalysisJobModel(BaseModel):
+    hypothesis: int = Field(ge=1, le=5)
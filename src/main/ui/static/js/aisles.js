@@ -10,7 +10,7 @@ document.addEventListener("DOMContentLoaded", function () {
 });
 
 function loadAisles() {
-    fetch('api/v1/aisles?limit=100') // Adjust limit as needed
+    fetch('api/v1/aisles?limit=100&include_total=false') // Adjust limit as needed
         .then(response => response.json())
         .then(data => {
             const aisles = data.aisles;
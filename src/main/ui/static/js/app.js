@@ -8,7 +8,7 @@ document.addEventListener("DOMContentLoaded", function () {
 });
 
 function loadOrders() {
-    fetch('/api/v1/orders?limit=100')
+    fetch('/api/v1/orders?limit=100&include_total=false')
         .then(response => response.json())
         .then(data => {
             const orders = data.orders;
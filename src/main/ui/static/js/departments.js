@@ -8,7 +8,7 @@ document.addEventListener("DOMContentLoaded", function () {
 });
 
 function loadDepartments() {
-    fetch('api/v1/departments?limit=100') // Adjust limit as needed
+    fetch('api/v1/departments?limit=100&include_total=false') // Adjust limit as needed
         .then(response => response.json())
         .then(data => {
             const departments = data.departments;
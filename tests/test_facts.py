@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from src.main.eda.facts import lookup_positions
+
+
+def test_dense_ids():
+    positions = lookup_positions(pd.Series([3, 1, 2, 9, -1]), ids=pd.Series([1, 2, 3]))
+    np.testing.assert_array_equal(positions, [2, 0, 1, -1, -1])
+
+
+def test_dense_duplicated_ids_resolve_to_last_row():
+    positions = lookup_positions(pd.Series([5, 7]), ids=pd.Series([5, 7, 5]))
+    np.testing.assert_array_equal(positions, [2, 1])
+
+
+def test_sparse_ids():
+    positions = lookup_positions(pd.Series([100000, 5, 42]), ids=pd.Series([5, 100000]))
+    np.testing.assert_array_equal(positions, [1, 0, -1])
+
+
+def test_sparse_duplicated_ids_resolve_to_last_row():
+    positions = lookup_positions(pd.Series([7, 5, 100000]), ids=pd.Series([100000, 5, 100000, 7]))
+    np.testing.assert_array_equal(positions, [3, 1, 2])
+
+
+def test_sparse_and_dense_agree():
+    rng = np.random.default_rng(0)
+    ids = pd.Series(rng.integers(0, 50, 40))
+    keys = pd.Series(rng.integers(-5, 60, 100))
+    # Shifting every id far past the row count takes the sparse path
+    shift = 10 ** 9
+    np.testing.assert_array_equal(lookup_positions(keys + shift, ids + shift), lookup_positions(keys, ids))
+
+
+def test_no_ids():
+    np.testing.assert_array_equal(lookup_positions(pd.Series([1, 2]), ids=pd.Series([], dtype="int64")), [-1, -1])
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from benchmarks.generate import seed_database
+from benchmarks.hypotheses import same_result
+from src.main.db import connector
+from src.main.eda.pipelines import PIPELINES
+from src.main.eda.utils import DataAnalysis
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+CONN_ID = "mongodb://fake"
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    """Every DBConnector of this module shares one fake MongoDB holding synthetic data."""
+    # Small, as mongomock runs the pipelines document by document in Python
+    client = mongomock_motor.AsyncMongoMockClient()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(connector, "AsyncIOMotorClient", lambda *args, **kwargs: client)
+        asyncio.run(seed_database(connector.DBConnector(CONN_ID).database, n_orders=300, n_products=300))
+        yield
+
+
+@pytest.mark.parametrize("name", sorted(PIPELINES))
+def test_mongo_backend_matches_pandas(seeded, name):
+    async def results():
+        pandas_analysis = DataAnalysis(CONN_ID, backends={})
+        mongo_analysis = DataAnalysis(CONN_ID, backends={name: "mongo"})
+        return await getattr(pandas_analysis, name)(), await getattr(mongo_analysis, name)()
+
+    pandas_result, mongo_result = asyncio.run(results())
+    assert same_result(pandas_result, mongo_result), f"pandas: {pandas_result}\nmongo:  {mongo_result}"